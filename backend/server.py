@@ -1,9 +1,11 @@
 from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, Response, BackgroundTasks, File, UploadFile
-from fastapi.responses import PlainTextResponse, HTMLResponse, FileResponse
+from fastapi.responses import PlainTextResponse, HTMLResponse, FileResponse, StreamingResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, UpdateOne, ReturnDocument
+from pymongo.errors import PyMongoError, DuplicateKeyError, BulkWriteError
 import os
 import logging
 from pathlib import Path
@@ -13,12 +15,25 @@ import uuid
 from datetime import datetime, timezone, timedelta
 import bcrypt
 import jwt
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; derivatives are skipped without it
+    Image = None
 from functools import wraps
 import hmac
 import hashlib
 import base64
-import shutil
+import json
 import mimetypes
+import re
+import shutil
+import tempfile
+from contextlib import asynccontextmanager
+from email.utils import formatdate, parsedate_to_datetime
+import time
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -39,10 +54,64 @@ JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production'
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION_DAYS = 7
 
+# Authenticated user cache configuration
+USER_CACHE_TTL_SECONDS = float(os.environ.get('USER_CACHE_TTL_SECONDS', '5'))
+USER_CACHE_MAX_SIZE = int(os.environ.get('USER_CACHE_MAX_SIZE', '10000'))
+
+# Pagination configuration
+DEFAULT_PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 500
+
+# Read notifications are removed by a TTL index this long after being read
+NOTIFICATION_READ_TTL_DAYS = int(os.environ.get('NOTIFICATION_READ_TTL_DAYS', '30'))
+
+# Team search ads are deleted by a TTL index this long after kick-off
+TEAM_SEARCH_EXPIRY_HOURS = int(os.environ.get('TEAM_SEARCH_EXPIRY_HOURS', '2'))
+TEAM_SEARCH_STARTS_AT_FORMAT = "%Y-%m-%dT%H:%M"
+
+# Field search facet bands: lower bounds, values above the last bound fall into "<last>+"
+FIELD_PRICE_BANDS = [0, 500, 1000, 1500, 2000, 3000]
+FIELD_RATING_BANDS = [0, 3, 4, 4.5]
+
+# Nearby field search limits
+NEARBY_DEFAULT_RADIUS_KM = 10.0
+NEARBY_MAX_RADIUS_KM = 200.0
+NEARBY_DEFAULT_LIMIT = 20
+
+# Startup sweep re-queues confirmed payments from this window that have no transaction
+PAYMENT_RECONCILE_DAYS = int(os.environ.get('PAYMENT_RECONCILE_DAYS', '7'))
+
+# Password hashing pool configuration
+PASSWORD_HASH_EXECUTOR = os.environ.get('PASSWORD_HASH_EXECUTOR', 'thread')  # thread, process
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '4'))
+PASSWORD_HASH_MAX_CONCURRENCY = int(os.environ.get('PASSWORD_HASH_MAX_CONCURRENCY', str(PASSWORD_HASH_WORKERS)))
+
 # Uploads directory
 UPLOADS_DIR = ROOT_DIR / 'uploads' / 'photos'
 UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
 
+# Photo upload limits
+MAX_PHOTO_SIZE = 5 * 1024 * 1024  # 5MB
+UPLOAD_CHUNK_SIZE = 256 * 1024
+# Allowance for multipart boundaries and headers on top of the file itself
+UPLOAD_MULTIPART_OVERHEAD = 64 * 1024
+
+# Photo derivatives: name -> longest edge in pixels, stored as WebP next to the original
+PHOTO_DERIVATIVES = {"thumb": 240, "card": 640, "full": 1600}
+PHOTO_DERIVATIVE_QUALITY = 80
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', '2'))
+
+# Orphaned photo files younger than this are left alone by garbage collection
+PHOTO_GC_GRACE_SECONDS = int(os.environ.get('PHOTO_GC_GRACE_SECONDS', '3600'))
+PHOTO_EXTENSIONS = {'image/jpeg': 'jpg', 'image/jpg': 'jpg', 'image/png': 'png', 'image/webp': 'webp'}
+PHOTO_KEY_PATTERN = re.compile(r'^[0-9a-f]{64}\.(jpg|png|webp)$')
+
+# Photo storage backend: local (UPLOADS_DIR) or s3 (S3_BUCKET, optional S3_ENDPOINT_URL for MinIO)
+PHOTO_STORAGE = os.environ.get('PHOTO_STORAGE', 'local')
+
+# Photo filenames never change content, so browsers may cache them for a year
+PHOTO_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
 # Logger
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -71,10 +140,12 @@ class FieldModel(BaseModel):
     city: str
     address: str
     location: Dict[str, float]  # {"lat": 41.0, "lng": 29.0}
+    geo: Optional[Dict[str, Any]] = None  # GeoJSON Point mirroring location, for the 2dsphere index
     price: float  # base_price_per_hour
     base_price_per_hour: float
     subscription_price_4_match: Optional[float] = None
     photos: List[str] = []  # List of photo URLs
+    photo_derivatives: List[Dict[str, str]] = []  # [{"photo_url", "thumb", "card", "full"}]
     cover_photo_url: Optional[str] = None  # Cover photo (first photo if not set)
     phone: str
     tax_number: Optional[str] = None  # DEPRECATED - now in owner_profiles
@@ -104,12 +175,14 @@ class Booking(BaseModel):
     is_subscription: bool = False
     matches_remaining: int = 1
     merchant_oid: Optional[str] = None
+    slot_active: bool = True  # Holds the (field_id, date, time) slot lock while active
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class Transaction(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     booking_id: str
+    merchant_oid: Optional[str] = None
     amount: float
     commission: float = 50.0  # Fixed 50 TL
     status: str = "pending"  # pending, success, failed
@@ -141,6 +214,14 @@ class TeamSearch(BaseModel):
     intensity_level: str = "orta"  # hafif, orta, rekabetçi
     message: str
     participants: List[str] = []  # user IDs who joined
+    # Denormalized at write time so the feed is a single indexed query
+    starts_at: Optional[str] = None  # YYYY-MM-DDTHH:MM
+    expires_at: Optional[datetime] = None  # BSON date for the TTL index
+    city: Optional[str] = None  # location_city, or the field's city
+    district: Optional[str] = None
+    creator_name: Optional[str] = None
+    field_name: Optional[str] = None
+    field_city: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class Notification(BaseModel):
@@ -150,6 +231,7 @@ class Notification(BaseModel):
     type: str  # booking, payment, review, team
     message: str
     read: bool = False
+    read_at: Optional[datetime] = None  # BSON date so the TTL index can expire read notifications
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class AuditLog(BaseModel):
@@ -279,11 +361,338 @@ class SupportMessageCreate(BaseModel):
     body: str
     attachments: Optional[List[str]] = []
 
+class PhotoUploadIntent(BaseModel):
+    content_type: str
+    size: int
+    sha256: str  # Hex digest of the file, used as its storage key
+
+class PhotoUploadConfirm(BaseModel):
+    key: str
+
 class SupportTicketUpdate(BaseModel):
     status: Optional[str] = None
     priority: Optional[str] = None
     assignee_user_id: Optional[str] = None
 
+# ==================== INDEX MANAGER ====================
+
+# Required indexes per collection: (name, keys, options)
+REQUIRED_INDEXES: Dict[str, List[tuple]] = {
+    "users": [
+        ("users_id_unique", [("id", ASCENDING)], {"unique": True}),
+        ("users_email_unique", [("email", ASCENDING)], {"unique": True}),
+        ("users_created_at_id", [("created_at", DESCENDING), ("id", DESCENDING)], {}),
+        ("users_role_created_at_id", [("role", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+    ],
+    "owner_profiles": [
+        ("owner_profiles_user_id_unique", [("user_id", ASCENDING)], {"unique": True}),
+        ("owner_profiles_tax_number", [("tax_number", ASCENDING)], {}),
+    ],
+    "fields": [
+        ("fields_id_unique", [("id", ASCENDING)], {"unique": True}),
+        ("fields_created_at_id", [("created_at", DESCENDING), ("id", DESCENDING)], {}),
+        ("fields_city_created_at_id", [("city", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+        ("fields_owner_id_created_at_id", [("owner_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+        ("fields_approved_created_at", [("approved", ASCENDING), ("created_at", DESCENDING)], {}),
+        ("fields_geo_2dsphere", [("geo", "2dsphere")], {}),
+        # Version 3 text indexes are diacritic-insensitive; turkish adds stemming and i/İ folding
+        # No weights: results keep the (created_at, id) keyset order, so textScore is never read
+        ("fields_text_search", [("name", "text"), ("city", "text"), ("address", "text")],
+         {"default_language": "turkish"}),
+    ],
+    "bookings": [
+        ("bookings_id_unique", [("id", ASCENDING)], {"unique": True}),
+        ("bookings_slot", [("field_id", ASCENDING), ("date", ASCENDING), ("time", ASCENDING), ("status", ASCENDING)], {}),
+        ("bookings_active_slot_unique", [("field_id", ASCENDING), ("date", ASCENDING), ("time", ASCENDING)],
+         {"unique": True, "partialFilterExpression": {"slot_active": True}}),
+        ("bookings_merchant_oid", [("merchant_oid", ASCENDING)], {"sparse": True}),
+        ("bookings_user_id_created_at_id", [("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+        ("bookings_field_id_created_at_id", [("field_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+        ("bookings_created_at_id", [("created_at", DESCENDING), ("id", DESCENDING)], {}),
+        ("bookings_status_created_at", [("status", ASCENDING), ("created_at", DESCENDING)], {}),
+    ],
+    "transactions": [
+        ("transactions_booking_id_unique", [("booking_id", ASCENDING)], {"unique": True}),
+        ("transactions_merchant_oid_unique", [("merchant_oid", ASCENDING)],
+         {"unique": True, "partialFilterExpression": {"merchant_oid": {"$type": "string"}}}),
+    ],
+    "reviews": [
+        ("reviews_field_id_approved_created_at_id", [("field_id", ASCENDING), ("approved", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+    ],
+    "notifications": [
+        ("notifications_id_unique", [("id", ASCENDING)], {"unique": True}),
+        ("notifications_user_id_created_at_id", [("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+        ("notifications_read_at_ttl", [("read_at", ASCENDING)], {"expireAfterSeconds": NOTIFICATION_READ_TTL_DAYS * 86400}),
+    ],
+    "notification_counters": [
+        ("notification_counters_user_id_unique", [("user_id", ASCENDING)], {"unique": True}),
+    ],
+    "team_searches": [
+        ("team_searches_id_unique", [("id", ASCENDING)], {"unique": True}),
+        ("team_searches_starts_at_id", [("starts_at", ASCENDING), ("id", ASCENDING)], {}),
+        # Equality filter + (starts_at, id) so each feed filter is served in sort order without a SORT stage
+        ("team_searches_city_starts_at_id", [("city", ASCENDING), ("starts_at", ASCENDING), ("id", ASCENDING)], {}),
+        ("team_searches_city_district_starts_at_id", [("city", ASCENDING), ("district", ASCENDING), ("starts_at", ASCENDING), ("id", ASCENDING)], {}),
+        ("team_searches_field_id_starts_at_id", [("field_id", ASCENDING), ("starts_at", ASCENDING), ("id", ASCENDING)], {}),
+        ("team_searches_position_starts_at_id", [("position", ASCENDING), ("starts_at", ASCENDING), ("id", ASCENDING)], {}),
+        ("team_searches_expires_at_ttl", [("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+    ],
+    "support_tickets": [
+        ("support_tickets_id_unique", [("id", ASCENDING)], {"unique": True}),
+        ("support_tickets_created_at_id", [("created_at", DESCENDING), ("id", DESCENDING)], {}),
+        ("support_tickets_requester_created_at", [("requester_user_id", ASCENDING), ("created_at", DESCENDING)], {}),
+    ],
+    "support_messages": [
+        ("support_messages_ticket_id_created_at", [("ticket_id", ASCENDING), ("created_at", ASCENDING)], {}),
+    ],
+    "photo_blobs": [
+        ("photo_blobs_refs", [("refs", ASCENDING)], {}),
+    ],
+    "jobs": [
+        ("jobs_id_unique", [("id", ASCENDING)], {"unique": True}),
+        ("jobs_status_run_at", [("status", ASCENDING), ("run_at", ASCENDING)], {}),
+        ("jobs_status_locked_until", [("status", ASCENDING), ("locked_until", ASCENDING)], {}),
+    ],
+    "jobs_dead_letter": [
+        ("jobs_dead_letter_failed_at", [("failed_at", DESCENDING)], {}),
+    ],
+    "booking_rollups": [
+        ("booking_rollups_day_status", [("day", ASCENDING), ("status", ASCENDING)], {}),
+        ("booking_rollups_field_id_day", [("field_id", ASCENDING), ("day", ASCENDING)], {}),
+    ],
+    "audit_logs": [
+        ("audit_logs_created_at", [("created_at", DESCENDING)], {}),
+    ],
+}
+
+class IndexManager:
+    """Creates the declared indexes idempotently and reports missing/unused ones"""
+
+    def __init__(self, database, required: Dict[str, List[tuple]], critical: set):
+        self.db = database
+        self.required = required
+        # Indexes that enforce correctness (not just speed); failures are surfaced loudly
+        self.critical = critical
+        self.ready: set = set()
+        self.last_report: Dict[str, Any] = {"status": "not_started"}
+
+    def is_ready(self, name: str) -> bool:
+        return name in self.ready
+
+    async def ensure_indexes(self) -> Dict[str, Any]:
+        started_at = time.monotonic()
+        created, failed = [], []
+        for collection_name, indexes in self.required.items():
+            collection = self.db[collection_name]
+            for name, keys, options in indexes:
+                index_started_at = time.monotonic()
+                try:
+                    # create_index is a no-op when an identical index already exists
+                    await collection.create_index(keys, name=name, background=True, **options)
+                    created.append(name)
+                    self.ready.add(name)
+                    logger.info(f"Index ready: {collection_name}.{name} ({(time.monotonic() - index_started_at) * 1000:.0f} ms)")
+                except PyMongoError as e:
+                    failed.append({"collection": collection_name, "index": name, "error": str(e), "critical": name in self.critical})
+                    if name in self.critical:
+                        logger.critical(f"CRITICAL index build failed, invariant not enforced: {collection_name}.{name}: {e}")
+                    else:
+                        logger.error(f"Index build failed: {collection_name}.{name}: {e}")
+        
+        elapsed_ms = round((time.monotonic() - started_at) * 1000, 2)
+        logger.info(f"Index bootstrap finished: {len(created)} ready, {len(failed)} failed in {elapsed_ms} ms")
+        self.last_report = {
+            "status": "degraded" if any(f['critical'] for f in failed) else "completed",
+            "ready": created,
+            "failed": failed,
+            "build_time_ms": elapsed_ms,
+            "finished_at": datetime.now(timezone.utc).isoformat()
+        }
+        return self.last_report
+
+    async def report(self) -> Dict[str, Any]:
+        """Compare declared indexes with the database and list never-used indexes"""
+        collections = {}
+        for collection_name, indexes in self.required.items():
+            collection = self.db[collection_name]
+            existing = await collection.index_information()
+            declared = {name for name, _, _ in indexes}
+            
+            usage = {}
+            try:
+                async for stat in collection.aggregate([{"$indexStats": {}}]):
+                    usage[stat['name']] = stat.get('accesses', {}).get('ops', 0)
+            except PyMongoError as e:
+                logger.warning(f"$indexStats unavailable for {collection_name}: {e}")
+            
+            collections[collection_name] = {
+                "missing": sorted(declared - set(existing)),
+                "undeclared": sorted(set(existing) - declared - {"_id_"}),
+                "unused": sorted(name for name, ops in usage.items() if ops == 0 and name != "_id_"),
+                "usage": usage
+            }
+        
+        return {"bootstrap": self.last_report, "collections": collections}
+
+# Unique indexes the write paths rely on for correctness
+SLOT_LOCK_INDEX = "bookings_active_slot_unique"
+TRANSACTION_BOOKING_INDEX = "transactions_booking_id_unique"
+CRITICAL_INDEXES = {SLOT_LOCK_INDEX, TRANSACTION_BOOKING_INDEX, "transactions_merchant_oid_unique"}
+
+index_manager = IndexManager(db, REQUIRED_INDEXES, CRITICAL_INDEXES)
+
+# Booking statuses that occupy a slot
+BOOKING_ACTIVE_STATUSES = ["paid", "confirmed", "pending"]
+
+async def backfill_booking_slot_locks():
+    """Set slot_active on bookings created before slot locking existed"""
+    activated = await db.bookings.update_many(
+        {"slot_active": {"$exists": False}, "status": {"$in": BOOKING_ACTIVE_STATUSES}},
+        {"$set": {"slot_active": True}}
+    )
+    released = await db.bookings.update_many(
+        {"slot_active": {"$exists": False}},
+        {"$set": {"slot_active": False}}
+    )
+    if activated.modified_count or released.modified_count:
+        logger.info(f"Slot lock backfill: {activated.modified_count} active, {released.modified_count} released")
+    
+    # Double bookings from before the lock would fail the unique index build:
+    # keep the earliest active booking per slot and release the rest
+    duplicates = await db.bookings.aggregate([
+        {"$match": {"slot_active": True}},
+        {"$sort": {"created_at": 1, "id": 1}},
+        {"$group": {
+            "_id": {"field_id": "$field_id", "date": "$date", "time": "$time"},
+            "ids": {"$push": "$id"}
+        }},
+        {"$match": {"ids.1": {"$exists": True}}}
+    ], allowDiskUse=True).to_list(None)
+    if duplicates:
+        losers = [booking_id for group in duplicates for booking_id in group['ids'][1:]]
+        await db.bookings.update_many({"id": {"$in": losers}}, {"$set": {"slot_active": False}})
+        logger.warning(
+            f"Slot lock backfill: released {len(losers)} double-booked slots in {len(duplicates)} groups, "
+            f"needs manual follow-up: {losers}"
+        )
+
+def field_geo_point(location: Dict[str, float]) -> Dict[str, Any]:
+    """GeoJSON Point ([lng, lat] order) for a {"lat", "lng"} location"""
+    try:
+        lat = float(location['lat'])
+        lng = float(location['lng'])
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Geçersiz konum")
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise HTTPException(status_code=400, detail="Geçersiz konum")
+    return {"type": "Point", "coordinates": [lng, lat]}
+
+async def backfill_field_geo_points():
+    """Derive geo from location on fields created before the 2dsphere index"""
+    result = await db.fields.update_many(
+        {
+            "geo": None,
+            "location.lat": {"$gte": -90, "$lte": 90},
+            "location.lng": {"$gte": -180, "$lte": 180}
+        },
+        [{"$set": {"geo": {"type": "Point", "coordinates": ["$location.lng", "$location.lat"]}}}]
+    )
+    if result.modified_count:
+        logger.info(f"Field geo backfill: {result.modified_count} fields updated")
+
+async def dedupe_legacy_transactions():
+    """Set aside duplicate transactions left by retried webhooks before the unique build
+
+    Keeps the earliest transaction per booking_id (then per merchant_oid) and
+    moves the rest to transactions_duplicates for manual review.
+    """
+    for key, match in (
+        ("booking_id", {}),
+        ("merchant_oid", {"merchant_oid": {"$type": "string"}})
+    ):
+        groups = await db.transactions.aggregate([
+            {"$match": match},
+            {"$sort": {"created_at": 1, "_id": 1}},
+            {"$group": {"_id": f"${key}", "ids": {"$push": "$_id"}}},
+            {"$match": {"ids.1": {"$exists": True}}}
+        ], allowDiskUse=True).to_list(None)
+        if not groups:
+            continue
+        
+        duplicate_ids = [doc_id for group in groups for doc_id in group['ids'][1:]]
+        duplicates = await db.transactions.find({"_id": {"$in": duplicate_ids}}).to_list(None)
+        try:
+            await db.transactions_duplicates.insert_many(duplicates, ordered=False)
+        except BulkWriteError as e:
+            # Already copied by an earlier, interrupted run
+            if any(err.get('code') != 11000 for err in e.details.get('writeErrors', [])):
+                raise
+        await db.transactions.delete_many({"_id": {"$in": duplicate_ids}})
+        logger.warning(
+            f"Transaction dedupe: moved {len(duplicate_ids)} duplicate transactions "
+            f"({len(groups)} {key} groups) to transactions_duplicates"
+        )
+
+# ==================== USER CACHE ====================
+
+class UserCache:
+    """In-process TTL/LRU cache of user documents keyed by user id"""
+
+    def __init__(self, ttl_seconds: float, max_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, user_id: str) -> Optional[Dict]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, user = entry
+        if expires_at <= time.monotonic():
+            del self._entries[user_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        # Return a copy so handlers cannot mutate the cached document
+        return dict(user)
+
+    def set(self, user_id: str, user: Dict):
+        if self.ttl_seconds <= 0 or self.max_size <= 0:
+            return
+        self._entries[user_id] = (time.monotonic() + self.ttl_seconds, dict(user))
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, user_id: str):
+        if self._entries.pop(user_id, None) is not None:
+            self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
+
+user_cache = UserCache(USER_CACHE_TTL_SECONDS, USER_CACHE_MAX_SIZE)
+
 # ==================== AUTH HELPERS ====================
 
 def hash_password(password: str) -> str:
@@ -292,6 +701,85 @@ def hash_password(password: str) -> str:
 def verify_password(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
+class PasswordHasher:
+    """Runs bcrypt hashing/verification on a bounded worker pool off the event loop"""
+
+    def __init__(self, executor_kind: str, workers: int, max_concurrency: int):
+        self.executor_kind = executor_kind
+        self.workers = workers
+        self.max_concurrency = max_concurrency
+        self._executor: Optional[Executor] = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.waiting = 0
+        self.in_flight = 0
+        self.max_waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _run(self, func, *args):
+        queued_at = time.monotonic()
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        
+        started_at = time.monotonic()
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._get_executor(), func, *args)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+        
+        # Only successful runs feed the averages, which divide by `completed`
+        self.completed += 1
+        self.total_wait_seconds += started_at - queued_at
+        self.total_run_seconds += time.monotonic() - started_at
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(verify_password, password, hashed)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "executor": self.executor_kind,
+            "workers": self.workers,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.waiting,
+            "max_queue_depth": self.max_waiting,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_ms": round(self.total_wait_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+            "avg_run_ms": round(self.total_run_seconds / self.completed * 1000, 2) if self.completed else 0.0
+        }
+
+password_hasher = PasswordHasher(PASSWORD_HASH_EXECUTOR, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_CONCURRENCY)
+
 def create_jwt_token(user_id: str, email: str, role: str) -> str:
     payload = {
         'user_id': user_id,
@@ -318,11 +806,17 @@ async def get_current_user(request: Request) -> Dict:
     
     try:
         payload = jwt.decode(session_token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        user = await db.users.find_one({"id": payload['user_id']}, {"_id": 0})
         
-        # User must exist in database
-        if not user:
-            raise HTTPException(status_code=401, detail="User not found")
+        # Serve repeat requests from the short-lived cache, fall back to MongoDB
+        user = user_cache.get(payload['user_id'])
+        if user is None:
+            user = await db.users.find_one({"id": payload['user_id']}, {"_id": 0})
+            
+            # User must exist in database
+            if not user:
+                raise HTTPException(status_code=401, detail="User not found")
+            
+            user_cache.set(user['id'], user)
         
         # Check if user is suspended
         if user.get('suspended', False):
@@ -345,6 +839,195 @@ async def get_admin_user(request: Request) -> Dict:
         raise HTTPException(status_code=403, detail="Admin access required")
     return user
 
+async def fetch_by_ids(collection, ids, fields: List[str]) -> Dict[str, Dict]:
+    """Resolve distinct ids with a single $in query, keyed by id"""
+    unique_ids = list({i for i in ids if i})
+    if not unique_ids:
+        return {}
+    projection = {"_id": 0, "id": 1, **{f: 1 for f in fields}}
+    docs = await collection.find({"id": {"$in": unique_ids}}, projection).to_list(None)
+    return {doc['id']: doc for doc in docs}
+
+def encode_cursor(doc: Dict) -> str:
+    """Encode the (created_at, id) keyset position of a document as an opaque cursor"""
+    raw = json.dumps({"c": doc['created_at'], "i": doc['id']}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> Dict:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return {"created_at": str(data['c']), "id": str(data['i'])}
+    except Exception:
+        raise HTTPException(status_code=400, detail="Geçersiz cursor")
+
+async def paginate(
+    collection,
+    query: Dict,
+    projection: Dict,
+    cursor: Optional[str],
+    limit: Optional[int],
+    pipeline: Optional[List[Dict]] = None,
+    legacy_limit: Optional[int] = None
+) -> Dict:
+    """Keyset-paginate a collection newest first on (created_at, id)
+
+    Stages in `pipeline` run after the sort and before the limit, so they may
+    filter documents out without breaking the cursor order. Callers that send
+    neither `limit` nor `cursor` get the endpoint's pre-pagination cap
+    (`legacy_limit`) so clients that do not page yet keep seeing everything.
+    """
+    if limit is None:
+        limit = legacy_limit if (legacy_limit and not cursor) else DEFAULT_PAGE_LIMIT
+    elif limit < 1:
+        raise HTTPException(status_code=400, detail="limit en az 1 olmalıdır")
+    else:
+        limit = min(limit, MAX_PAGE_LIMIT)
+    
+    if cursor:
+        position = decode_cursor(cursor)
+        query = {"$and": [query, {"$or": [
+            {"created_at": {"$lt": position['created_at']}},
+            {"created_at": position['created_at'], "id": {"$lt": position['id']}}
+        ]}]}
+    
+    sort = [("created_at", DESCENDING), ("id", DESCENDING)]
+    if pipeline is None:
+        docs = await collection.find(query, projection).sort(sort).limit(limit + 1).to_list(limit + 1)
+    else:
+        docs = await collection.aggregate([
+            {"$match": query},
+            {"$sort": dict(sort)},
+            *pipeline,
+            {"$limit": limit + 1},
+            {"$project": projection}
+        ]).to_list(limit + 1)
+    
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    return {
+        "items": docs,
+        "next_cursor": encode_cursor(docs[-1]) if has_more else None
+    }
+
+class AuditLogBuffer:
+    """Buffers audit log entries in memory and flushes them with insert_many"""
+
+    def __init__(self, database, batch_size: int, flush_interval: float, max_buffer: int, put_timeout: float):
+        self.db = database
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.put_timeout = put_timeout
+        self._entries: List[Dict] = []
+        self._flush_lock = asyncio.Lock()
+        self._space = asyncio.Condition()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.buffered = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.flush_failures = 0
+        self.backpressure_waits = 0
+
+    async def add(self, entry: Dict):
+        """Queue an entry; waits for room when full and drops after put_timeout"""
+        if len(self._entries) >= self.max_buffer:
+            self.backpressure_waits += 1
+            self._wakeup.set()
+            try:
+                async with self._space:
+                    await asyncio.wait_for(
+                        self._space.wait_for(lambda: len(self._entries) < self.max_buffer),
+                        timeout=self.put_timeout
+                    )
+            except asyncio.TimeoutError:
+                self.dropped += 1
+                logger.error(f"Audit log buffer full, dropped {entry['action']} on {entry['target_type']}:{entry['target_id']}")
+                return
+        
+        self._entries.append(entry)
+        self.buffered += 1
+        if len(self._entries) >= self.batch_size:
+            self._wakeup.set()
+
+    async def flush(self):
+        """Write all buffered entries; rows that did not land go back to the front of the buffer
+
+        insert_many assigns each entry an _id that is kept across retries, so a
+        row that did land in an earlier failed attempt comes back as a duplicate
+        key error and is counted as flushed instead of being written twice.
+        """
+        async with self._flush_lock:
+            while self._entries:
+                batch = self._entries[:self.batch_size]
+                del self._entries[:len(batch)]
+                try:
+                    await self.db.audit_logs.insert_many(batch, ordered=False)
+                    self.flushed += len(batch)
+                except BulkWriteError as e:
+                    failed_indexes = {
+                        err['index'] for err in e.details.get('writeErrors', [])
+                        if err.get('code') != 11000
+                    }
+                    self.flushed += len(batch) - len(failed_indexes)
+                    if failed_indexes:
+                        retry = [entry for i, entry in enumerate(batch) if i in failed_indexes]
+                        self._requeue(retry, e)
+                        break
+                except PyMongoError as e:
+                    # Unknown which rows landed; the kept _ids dedupe the retry
+                    self._requeue(batch, e)
+                    break
+                finally:
+                    async with self._space:
+                        self._space.notify_all()
+
+    def _requeue(self, entries: List[Dict], error: Exception):
+        self.flush_failures += 1
+        room = max(self.max_buffer - len(self._entries), 0)
+        self._entries[:0] = entries[:room]
+        self.dropped += len(entries) - min(room, len(entries))
+        logger.error(f"Audit log flush failed, {len(self._entries)} entries pending: {error}")
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and write whatever is still buffered"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._entries),
+            "buffered": self.buffered,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "flush_failures": self.flush_failures,
+            "backpressure_waits": self.backpressure_waits
+        }
+
+audit_log_buffer = AuditLogBuffer(
+    db,
+    batch_size=int(os.environ.get('AUDIT_LOG_BATCH_SIZE', '100')),
+    flush_interval=float(os.environ.get('AUDIT_LOG_FLUSH_SECONDS', '1')),
+    max_buffer=int(os.environ.get('AUDIT_LOG_MAX_BUFFER', '10000')),
+    put_timeout=float(os.environ.get('AUDIT_LOG_PUT_TIMEOUT_SECONDS', '2'))
+)
+
 async def create_audit_log(admin_id: str, admin_email: str, action: str, target_type: str, target_id: str, details: Dict = None):
     """Create audit log entry"""
     log = AuditLog(
@@ -357,9 +1040,270 @@ async def create_audit_log(admin_id: str, admin_email: str, action: str, target_
     )
     log_dict = log.model_dump()
     log_dict['created_at'] = log_dict['created_at'].isoformat()
-    await db.audit_logs.insert_one(log_dict)
+    await audit_log_buffer.add(log_dict)
     logger.info(f"Audit log: {action} by {admin_email} on {target_type}:{target_id}")
 
+# ==================== NOTIFICATION HUB ====================
+
+NOTIFICATION_STREAM_QUEUE_SIZE = int(os.environ.get('NOTIFICATION_STREAM_QUEUE_SIZE', '100'))
+NOTIFICATION_STREAM_HEARTBEAT_SECONDS = float(os.environ.get('NOTIFICATION_STREAM_HEARTBEAT_SECONDS', '15'))
+
+class NotificationHub:
+    """In-process pub/sub fanning notification events out to connected streams per user"""
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, set] = {}
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[user_id]
+
+    def publish(self, user_id: str, event: str, data: Dict):
+        self.published += 1
+        for queue in self._subscribers.get(user_id, ()):
+            if queue.full():
+                # Slow consumer: drop its oldest event rather than block the producer
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait((event, data))
+            self.delivered += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "users": len(self._subscribers),
+            "connections": sum(len(queues) for queues in self._subscribers.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped
+        }
+
+notification_hub = NotificationHub(NOTIFICATION_STREAM_QUEUE_SIZE)
+
+async def adjust_unread_count(user_id: str, delta: int) -> int:
+    """Apply delta to the per-user unread counter and return the new value
+
+    Call after the notification write so a missing counter can be seeded from
+    the notifications themselves, which then already include this change.
+    """
+    counter = await db.notification_counters.find_one_and_update(
+        {"user_id": user_id},
+        {"$inc": {"unread": delta}},
+        projection={"_id": 0, "unread": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if counter is not None:
+        return max(counter['unread'], 0)
+    
+    # First touch for this user: seed from existing unread notifications
+    unread = await db.notifications.count_documents({"user_id": user_id, "read": False})
+    try:
+        await db.notification_counters.insert_one({"user_id": user_id, "unread": unread})
+    except DuplicateKeyError:
+        # A concurrent first touch seeded it; recount now that both writes have landed
+        unread = await db.notifications.count_documents({"user_id": user_id, "read": False})
+        await db.notification_counters.update_one({"user_id": user_id}, {"$set": {"unread": unread}})
+    return unread
+
+async def get_unread_count(user_id: str) -> int:
+    return await adjust_unread_count(user_id, 0)
+
+async def create_notification(user_id: str, type: str, message: str, notif_id: Optional[str] = None) -> Dict:
+    """Insert a notification and push it to the user's open streams
+
+    A fixed notif_id makes retries idempotent.
+    """
+    notif = Notification(user_id=user_id, type=type, message=message)
+    notif_dict = notif.model_dump()
+    if notif_id:
+        notif_dict['id'] = notif_id
+    notif_dict['created_at'] = notif_dict['created_at'].isoformat()
+    try:
+        await db.notifications.insert_one(notif_dict)
+    except DuplicateKeyError:
+        logger.info(f"Notification {notif_dict['id']} already delivered")
+        notif_dict.pop('_id', None)
+        return notif_dict
+    notif_dict.pop('_id', None)
+    
+    unread = await adjust_unread_count(user_id, 1)
+    notification_hub.publish(user_id, "notification", {"notification": notif_dict, "unread": unread})
+    return notif_dict
+
+# ==================== JOB QUEUE ====================
+
+class JobQueue:
+    """Durable MongoDB-backed job queue with retry/backoff and a dead-letter collection"""
+
+    def __init__(self, database, workers: int, max_attempts: int, poll_interval: float, lease_seconds: int):
+        self.db = database
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.handlers: Dict[str, Any] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self.enqueued = 0
+        self.succeeded = 0
+        self.retried = 0
+        self.dead_lettered = 0
+
+    def handler(self, job_type: str):
+        """Register an async handler: @job_queue.handler("type") async def f(payload)"""
+        def register(func):
+            self.handlers[job_type] = func
+            return func
+        return register
+
+    async def enqueue(self, job_type: str, payload: Dict, delay_seconds: float = 0, job_id: Optional[str] = None) -> str:
+        """Insert a job; a fixed job_id makes enqueueing idempotent while that job is pending"""
+        if job_type not in self.handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+        now = datetime.now(timezone.utc)
+        job = {
+            "id": job_id or str(uuid.uuid4()),
+            "type": job_type,
+            "payload": payload,
+            "status": "queued",
+            "attempts": 0,
+            "max_attempts": self.max_attempts,
+            "run_at": (now + timedelta(seconds=delay_seconds)).isoformat(),
+            "locked_until": None,
+            "last_error": None,
+            "created_at": now.isoformat()
+        }
+        try:
+            await self.db.jobs.insert_one(job)
+        except DuplicateKeyError:
+            # Same job is already queued or running
+            return job['id']
+        self.enqueued += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job['id']
+
+    async def _claim(self) -> Optional[Dict]:
+        now = datetime.now(timezone.utc)
+        return await self.db.jobs.find_one_and_update(
+            {"$or": [
+                {"status": "queued", "run_at": {"$lte": now.isoformat()}},
+                # Lease expired: the worker that claimed it died mid-job
+                {"status": "running", "locked_until": {"$lt": now.isoformat()}}
+            ]},
+            {
+                "$set": {
+                    "status": "running",
+                    "locked_until": (now + timedelta(seconds=self.lease_seconds)).isoformat()
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("run_at", ASCENDING)],
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _run_job(self, job: Dict):
+        try:
+            await self.handlers[job['type']](job['payload'])
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if job['attempts'] >= job.get('max_attempts', self.max_attempts):
+                dead = {**job, "status": "dead", "last_error": error,
+                        "failed_at": datetime.now(timezone.utc).isoformat()}
+                await self.db.jobs_dead_letter.insert_one(dead)
+                await self.db.jobs.delete_one({"id": job['id']})
+                self.dead_lettered += 1
+                logger.error(f"Job {job['type']}:{job['id']} dead-lettered after {job['attempts']} attempts: {error}")
+            else:
+                # Exponential backoff: 2s, 4s, 8s, ... capped at 5 minutes
+                backoff = min(2 ** job['attempts'], 300)
+                run_at = datetime.now(timezone.utc) + timedelta(seconds=backoff)
+                await self.db.jobs.update_one(
+                    {"id": job['id']},
+                    {"$set": {"status": "queued", "run_at": run_at.isoformat(), "locked_until": None, "last_error": error}}
+                )
+                self.retried += 1
+                logger.warning(f"Job {job['type']}:{job['id']} failed (attempt {job['attempts']}), retrying in {backoff}s: {error}")
+            return
+        
+        await self.db.jobs.delete_one({"id": job['id']})
+        self.succeeded += 1
+
+    async def _worker(self):
+        while True:
+            try:
+                job = await self._claim()
+            except PyMongoError as e:
+                logger.error(f"Job claim failed: {e}")
+                job = None
+            
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            try:
+                await self._run_job(job)
+            except PyMongoError as e:
+                # The lease expires and another worker picks the job up again
+                logger.error(f"Job bookkeeping failed for {job['id']}: {e}")
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._tasks),
+            "enqueued": self.enqueued,
+            "succeeded": self.succeeded,
+            "retried": self.retried,
+            "dead_lettered": self.dead_lettered
+        }
+
+job_queue = JobQueue(
+    db,
+    workers=int(os.environ.get('JOB_WORKERS', '2')),
+    max_attempts=int(os.environ.get('JOB_MAX_ATTEMPTS', '5')),
+    poll_interval=float(os.environ.get('JOB_POLL_INTERVAL_SECONDS', '1')),
+    lease_seconds=int(os.environ.get('JOB_LEASE_SECONDS', '60'))
+)
+
+@job_queue.handler("notify_user")
+async def notify_user_job(payload: Dict):
+    await create_notification(payload['user_id'], payload['type'], payload['message'], notif_id=payload['notif_id'])
+
+async def enqueue_notification(user_id: str, type: str, message: str) -> str:
+    """Queue a notification; the pre-assigned id dedupes retried deliveries"""
+    return await job_queue.enqueue("notify_user", {
+        "user_id": user_id,
+        "type": type,
+        "message": message,
+        "notif_id": str(uuid.uuid4())
+    })
+
 # ==================== AUTH ROUTES ====================
 
 @api_router.post("/auth/register")
@@ -401,7 +1345,7 @@ async def register(req: RegisterRequest):
     
     user = User(
         email=req.email,
-        password=hash_password(req.password),
+        password=await password_hasher.hash(req.password),
         name=req.name,
         phone=req.phone,
         role=req.role,
@@ -452,7 +1396,7 @@ async def login(req: LoginRequest, response: Response):
     if not user or not user.get('password'):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    if not verify_password(req.password, user['password']):
+    if not await password_hasher.verify(req.password, user['password']):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     token = create_jwt_token(user['id'], user['email'], user['role'])
@@ -556,15 +1500,210 @@ async def logout(response: Response):
 
 # ==================== FIELDS ROUTES ====================
 
+def requested_slot_times(date: str, time_from: Optional[str], time_to: Optional[str]) -> List[str]:
+    """Hourly slot start times between time_from and time_to (inclusive) on date, skipping past ones"""
+    try:
+        day = datetime.strptime(date, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Geçersiz tarih formatı")
+    
+    slot_times = [start for start, _ in CALENDAR_HOURS]
+    for value in (time_from, time_to):
+        if value and value not in slot_times:
+            raise HTTPException(status_code=400, detail="Saat HH:00 formatında olmalıdır")
+    first = slot_times.index(time_from) if time_from else 0
+    last = slot_times.index(time_to) if time_to else (first if time_from else len(slot_times) - 1)
+    if last < first:
+        raise HTTPException(status_code=400, detail="Bitiş saati başlangıçtan önce olamaz")
+    
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    if day < now.date():
+        return []
+    if day == now.date():
+        # Slots that already started cannot be booked
+        first = max(first, now.hour + (1 if (now.minute or now.second or now.microsecond) else 0))
+    return slot_times[first:last + 1]
+
+def field_availability_stages(date: str, slot_times: List[str]) -> List[Dict]:
+    """Aggregation stages keeping fields with at least one unbooked slot among slot_times
+
+    Anti-joins bookings on (field_id, date, time) through the active slot lock index
+    and adds the free slots as `available_times`.
+    """
+    return [
+        {"$lookup": {
+            "from": "bookings",
+            "let": {"field_id": "$id"},
+            "pipeline": [
+                {"$match": {
+                    "slot_active": True,
+                    "date": date,
+                    "time": {"$in": slot_times},
+                    "$expr": {"$eq": ["$field_id", "$$field_id"]}
+                }},
+                {"$project": {"_id": 0, "time": 1}}
+            ],
+            "as": "booked_slots"
+        }},
+        {"$set": {"available_times": {"$filter": {
+            "input": slot_times,
+            "cond": {"$not": [{"$in": ["$$this", "$booked_slots.time"]}]}
+        }}}},
+        {"$match": {"available_times.0": {"$exists": True}}},
+        {"$unset": "booked_slots"}
+    ]
+
+# $bucket groupBy value for fields without a numeric price/rating; below every band
+UNKNOWN_BAND = -1
+
+def bucket_group_by(value: Any) -> Dict:
+    """Numeric values (negatives clamped to 0) or UNKNOWN_BAND for missing/non-numeric ones"""
+    return {"$cond": [
+        {"$in": [{"$type": value}, ["double", "int", "long", "decimal"]]},
+        {"$max": [value, 0]},
+        UNKNOWN_BAND
+    ]}
+
+def bucket_counts(buckets: List[Dict], bounds: List[float]) -> tuple:
+    """Turn $bucket output into ([{"min", "max", "count"}], unknown count)
+
+    The open band above the last bound has max None.
+    """
+    upper = dict(zip(bounds, bounds[1:]))
+    bands = []
+    unknown = 0
+    for b in buckets:
+        if b['_id'] == UNKNOWN_BAND:
+            unknown = b['count']
+            continue
+        bands.append({
+            "min": bounds[-1] if b['_id'] == "open" else b['_id'],
+            "max": None if b['_id'] == "open" else upper[b['_id']],
+            "count": b['count']
+        })
+    return bands, unknown
+
+async def field_search_facets(query: Dict, pipeline: Optional[List[Dict]] = None) -> Dict[str, Any]:
+    """City, price band and rating band counts for a field search in one $facet
+
+    `pipeline` (e.g. the availability stages) runs before the counts, just as
+    in the listing. The city facet ignores the city filter so other cities stay
+    selectable.
+    """
+    base = {k: v for k, v in query.items() if k != 'city'}
+    narrowed = [{"$match": {"city": query['city']}}] if 'city' in query else []
+    result = await db.fields.aggregate([
+        {"$match": base},
+        *(pipeline or []),
+        {"$facet": {
+            "cities": [
+                {"$group": {"_id": "$city", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}}
+            ],
+            "price_bands": narrowed + [
+                {"$bucket": {
+                    # Legacy fields may only carry `price`
+                    "groupBy": bucket_group_by({"$ifNull": ["$base_price_per_hour", "$price"]}),
+                    "boundaries": [UNKNOWN_BAND] + FIELD_PRICE_BANDS,
+                    "default": "open",
+                    "output": {"count": {"$sum": 1}}
+                }}
+            ],
+            "rating_bands": narrowed + [
+                {"$bucket": {
+                    "groupBy": bucket_group_by("$rating"),
+                    "boundaries": [UNKNOWN_BAND] + FIELD_RATING_BANDS,
+                    "default": "open",
+                    "output": {"count": {"$sum": 1}}
+                }}
+            ]
+        }}
+    ]).to_list(1)
+    facets = result[0] if result else {"cities": [], "price_bands": [], "rating_bands": []}
+    price_bands, price_unknown = bucket_counts(facets['price_bands'], FIELD_PRICE_BANDS)
+    rating_bands, rating_unknown = bucket_counts(facets['rating_bands'], FIELD_RATING_BANDS)
+    return {
+        "cities": [{"value": c['_id'], "count": c['count']} for c in facets['cities']],
+        "price_bands": price_bands,
+        "price_unknown": price_unknown,
+        "rating_bands": rating_bands,
+        "rating_unknown": rating_unknown
+    }
+
 @api_router.get("/fields")
-async def get_fields(city: Optional[str] = None, date: Optional[str] = None, time: Optional[str] = None):
+async def get_fields(
+    q: Optional[str] = None,
+    city: Optional[str] = None,
+    date: Optional[str] = None,
+    time: Optional[str] = None,
+    time_to: Optional[str] = None,
+    owner_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    facets: bool = False
+):
+    """List fields; with `date` (and optionally `time`..`time_to`) only those with a free slot
+
+    `q` runs a full-text search over name, city and address (results keep the
+    newest-first order); `facets=true` adds city, price band and rating band
+    counts for the same search, city and availability filters.
+    """
     query = {}
+    if q and q.strip():
+        query['$text'] = {"$search": q.strip(), "$language": "turkish"}
     if city:
         query['city'] = city
+    if owner_id:
+        query['owner_id'] = owner_id
+    
+    pipeline = None
+    if date:
+        pipeline = field_availability_stages(date, requested_slot_times(date, time, time_to))
+    elif time or time_to:
+        raise HTTPException(status_code=400, detail="Saat filtresi için tarih seçiniz")
+    
+    if not facets:
+        page = await paginate(db.fields, query, {"_id": 0}, cursor, limit, pipeline, legacy_limit=1000)
+        return {"fields": page['items'], "next_cursor": page['next_cursor']}
+    
+    page, facet_counts = await asyncio.gather(
+        paginate(db.fields, query, {"_id": 0}, cursor, limit, pipeline, legacy_limit=1000),
+        field_search_facets(query, pipeline)
+    )
+    return {"fields": page['items'], "next_cursor": page['next_cursor'], "facets": facet_counts}
+
+@api_router.get("/fields/nearby")
+async def get_nearby_fields(
+    lat: float,
+    lng: float,
+    radius_km: float = NEARBY_DEFAULT_RADIUS_KM,
+    limit: int = NEARBY_DEFAULT_LIMIT,
+    city: Optional[str] = None
+):
+    """Fields within radius_km of a point, nearest first, with distance_km"""
+    if radius_km <= 0 or radius_km > NEARBY_MAX_RADIUS_KM:
+        raise HTTPException(status_code=400, detail=f"Yarıçap 0 ile {NEARBY_MAX_RADIUS_KM:g} km arasında olmalı")
+    limit = max(1, min(limit, MAX_PAGE_LIMIT))
+    
+    geo_near = {
+        "near": field_geo_point({"lat": lat, "lng": lng}),
+        "distanceField": "distance_m",
+        "maxDistance": radius_km * 1000,
+        "spherical": True,
+        "key": "geo"
+    }
+    if city:
+        geo_near["query"] = {"city": city}
+    
+    fields = await db.fields.aggregate([
+        {"$geoNear": geo_near},
+        {"$limit": limit},
+        {"$project": {"_id": 0}}
+    ]).to_list(limit)
     
-    fields = await db.fields.find(query, {"_id": 0}).to_list(1000)
+    for field in fields:
+        field['distance_km'] = round(field.pop('distance_m') / 1000, 2)
     
-    # TODO: Filter by availability based on date and time
     return {"fields": fields}
 
 @api_router.get("/fields/{field_id}")
@@ -619,6 +1758,7 @@ async def create_field(field: FieldCreate, user: Dict = Depends(get_current_user
         city=field.city,
         address=field.address,
         location=field.location,
+        geo=field_geo_point(field.location),
         price=field.base_price_per_hour,  # For backward compatibility
         base_price_per_hour=field.base_price_per_hour,
         subscription_price_4_match=field.subscription_price_4_match,
@@ -669,61 +1809,49 @@ async def get_availability(field_id: str, date: str):
         "booked_slots": booked_times
     }
 
-@api_router.get("/fields/{field_id}/calendar")
-async def get_field_calendar(field_id: str):
-    """Get weekly calendar view for a field with 24-hour slots"""
-    from datetime import date, timedelta
-    
-    field = await db.fields.find_one({"id": field_id}, {"_id": 0})
-    if not field:
-        raise HTTPException(status_code=404, detail="Field not found")
-    
-    # Get pricing
-    base_price = field.get('base_price_per_hour') or field.get('price', 0)
+# Static hour templates shared by every calendar day (00:00 - 23:00)
+CALENDAR_HOURS = [
+    (f"{hour:02d}:00", f"{(hour + 1) % 24:02d}:00")
+    for hour in range(24)
+]
+CALENDAR_MAX_DAYS = 60
+
+def build_calendar_days(bookings: List[Dict], start_date, days: int, base_price: float, now: datetime) -> List[Dict]:
+    """Build per-day slot lists from a booking window using a (date, time) index"""
+    # Bucket bookings once; the first booking at a slot decides its status
+    slot_index: Dict[str, Dict[str, Dict]] = {}
+    for b in bookings:
+        day_slots = slot_index.setdefault(b['date'], {})
+        day_slots.setdefault(b['time'], b)
+    
+    today = now.date()
+    # Slots starting strictly before `now` are past
+    past_hours_today = now.hour + (1 if (now.minute or now.second or now.microsecond) else 0)
     
-    # Get next 7 days
-    today = date.today()
     days_data = []
-    
-    for day_offset in range(7):
-        current_date = today + timedelta(days=day_offset)
+    for day_offset in range(days):
+        current_date = start_date + timedelta(days=day_offset)
         date_str = current_date.isoformat()
+        day_bookings = slot_index.get(date_str, {})
         
-        # Get bookings for this date
-        bookings = await db.bookings.find({
-            "field_id": field_id,
-            "date": date_str,
-            "status": {"$in": ["confirmed", "pending", "paid"]}
-        }, {"_id": 0}).to_list(100)
+        if current_date < today:
+            past_hours = 24
+        elif current_date == today:
+            past_hours = past_hours_today
+        else:
+            past_hours = 0
         
-        # Create 24-hour slots (00:00 - 23:00)
         slots = []
-        now = datetime.now(timezone.utc).replace(tzinfo=None)
-        
-        for hour in range(24):
-            start_time = f"{hour:02d}:00"
-            end_hour = (hour + 1) % 24
-            end_time = f"{end_hour:02d}:00"
-            
-            # Format label
-            label = f"{start_time} - {end_time}"
-            
-            # Check if this slot is booked
-            is_booked = any(b['time'] == start_time for b in bookings)
-            
-            # Check if it's in the past
-            slot_datetime = datetime.fromisoformat(f"{date_str}T{start_time}:00")
-            is_past = slot_datetime < now
+        for hour, (start_time, end_time) in enumerate(CALENDAR_HOURS):
+            booking = day_bookings.get(start_time)
             
             # Determine status
-            if is_past:
+            if hour < past_hours:
                 status = "past"
                 status_label = "GEÇMİŞ"
                 bookable = False
-            elif is_booked:
-                # Check if it's subscription
-                booking = next((b for b in bookings if b['time'] == start_time), None)
-                if booking and booking.get('is_subscription'):
+            elif booking is not None:
+                if booking.get('is_subscription'):
                     status = "subscription_locked"
                     status_label = "ABONELİKLİ"
                 else:
@@ -738,7 +1866,7 @@ async def get_field_calendar(field_id: str):
             slots.append({
                 "start": start_time,
                 "end": end_time,
-                "label": label,
+                "label": f"{start_time} - {end_time}",
                 "status": status,
                 "status_label": status_label,
                 "bookable": bookable,
@@ -752,6 +1880,36 @@ async def get_field_calendar(field_id: str):
             "slots": slots
         })
     
+    return days_data
+
+@api_router.get("/fields/{field_id}/calendar")
+async def get_field_calendar(field_id: str, days: int = 7):
+    """Get calendar view for a field with 24-hour slots (7 days by default)"""
+    from datetime import date
+    
+    if days < 1 or days > CALENDAR_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"days 1 ile {CALENDAR_MAX_DAYS} arasında olmalıdır")
+    
+    field = await db.fields.find_one({"id": field_id}, {"_id": 0})
+    if not field:
+        raise HTTPException(status_code=404, detail="Field not found")
+    
+    # Get pricing
+    base_price = field.get('base_price_per_hour') or field.get('price', 0)
+    
+    today = date.today()
+    end_date = today + timedelta(days=days - 1)
+    
+    # Fetch the whole window in one ranged query (dates are ISO strings)
+    bookings = await db.bookings.find({
+        "field_id": field_id,
+        "date": {"$gte": today.isoformat(), "$lte": end_date.isoformat()},
+        "status": {"$in": BOOKING_ACTIVE_STATUSES}
+    }, {"_id": 0, "date": 1, "time": 1, "is_subscription": 1}).to_list(None)
+    
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    days_data = build_calendar_days(bookings, today, days, base_price, now)
+    
     return {
         "field_id": field_id,
         "field_name": field['name'],
@@ -759,6 +1917,135 @@ async def get_field_calendar(field_id: str):
         "days": days_data
     }
 
+# ==================== BOOKING ROLLUPS ====================
+
+# Statuses counted as revenue in dashboard and analytics
+REVENUE_STATUSES = ["paid", "confirmed"]
+
+def booking_rollup_update(booking: Dict, status: str, sign: int) -> UpdateOne:
+    """Upsert increment for the day x field x status rollup row of a booking"""
+    day = str(booking['created_at'])[:10]
+    return UpdateOne(
+        {"_id": f"{day}|{booking['field_id']}|{status}"},
+        {
+            "$setOnInsert": {"day": day, "field_id": booking['field_id'], "status": status},
+            "$inc": {
+                "count": sign,
+                "gross": sign * booking.get('total_amount_user_paid', 0),
+                "platform_fee": sign * booking.get('platform_fee_amount', 50),
+                "owner_share": sign * booking.get('owner_share_amount', 0)
+            }
+        },
+        upsert=True
+    )
+
+async def record_booking_rollup(booking: Dict, from_status: Optional[str], to_status: str):
+    """Move a booking between rollup rows (from_status=None for new bookings)"""
+    if from_status == to_status:
+        return
+    ops = [booking_rollup_update(booking, to_status, 1)]
+    if from_status:
+        ops.append(booking_rollup_update(booking, from_status, -1))
+    try:
+        await db.booking_rollups.bulk_write(ops, ordered=False)
+    except PyMongoError as e:
+        # Rollups are derived data; a rebuild restores them
+        logger.error(f"Booking rollup update failed for {booking.get('id')}: {e}")
+
+async def rebuild_booking_rollups() -> int:
+    """Recompute booking_rollups from bookings into a staging collection and swap it in
+
+    Offline maintenance: increments recorded by live requests while the
+    aggregation runs are not in the snapshot and are lost by the swap, so run it
+    with the API stopped (`python server.py rebuild-rollups`). Readers never see
+    an empty or partial collection because the swap is a single rename.
+    """
+    started_at = time.monotonic()
+    if await db.bookings.estimated_document_count() == 0:
+        await db.booking_rollups.delete_many({})
+        return 0
+    
+    pipeline = [
+        {"$group": {
+            "_id": {
+                "day": {"$substrCP": ["$created_at", 0, 10]},
+                "field_id": "$field_id",
+                "status": "$status"
+            },
+            "count": {"$sum": 1},
+            "gross": {"$sum": {"$ifNull": ["$total_amount_user_paid", 0]}},
+            "platform_fee": {"$sum": {"$ifNull": ["$platform_fee_amount", 50]}},
+            "owner_share": {"$sum": {"$ifNull": ["$owner_share_amount", 0]}}
+        }},
+        {"$project": {
+            "_id": {"$concat": ["$_id.day", "|", "$_id.field_id", "|", "$_id.status"]},
+            "day": "$_id.day",
+            "field_id": "$_id.field_id",
+            "status": "$_id.status",
+            "count": 1,
+            "gross": 1,
+            "platform_fee": 1,
+            "owner_share": 1
+        }},
+        {"$out": "booking_rollups_staging"}
+    ]
+    await db.bookings.aggregate(pipeline).to_list(None)
+    # Indexes travel with the collection through the rename
+    for name, keys, options in REQUIRED_INDEXES["booking_rollups"]:
+        await db.booking_rollups_staging.create_index(keys, name=name, **options)
+    await db.booking_rollups_staging.rename("booking_rollups", dropTarget=True)
+    rows = await db.booking_rollups.count_documents({})
+    logger.info(f"Booking rollups rebuilt: {rows} rows in {(time.monotonic() - started_at) * 1000:.0f} ms")
+    return rows
+
+# Persisted marker: the one-time backfill ran to completion
+ROLLUP_BACKFILL_MARKER = "booking_rollups_backfill"
+ROLLUP_BACKFILL_WAIT_SECONDS = 120
+
+async def ensure_booking_rollups():
+    """One-time rollup backfill, awaited at startup before this process records rollups
+
+    Keyed on a marker document rather than an empty collection, so bookings
+    written before the backfill cannot make it look done. A process that loses
+    the claim waits for the winner so its own increments are not swapped away.
+    """
+    marker = await db.migrations.find_one({"_id": ROLLUP_BACKFILL_MARKER})
+    if marker and marker.get('status') == "done":
+        return
+    
+    try:
+        await db.migrations.insert_one({
+            "_id": ROLLUP_BACKFILL_MARKER,
+            "status": "running",
+            "started_at": datetime.now(timezone.utc).isoformat()
+        })
+    except DuplicateKeyError:
+        for _ in range(ROLLUP_BACKFILL_WAIT_SECONDS):
+            await asyncio.sleep(1)
+            marker = await db.migrations.find_one({"_id": ROLLUP_BACKFILL_MARKER})
+            if marker is None or marker.get('status') == "done":
+                return
+        logger.error(
+            f"Booking rollup backfill still running after {ROLLUP_BACKFILL_WAIT_SECONDS}s; "
+            "if it crashed, run `python server.py rebuild-rollups`"
+        )
+        return
+    
+    try:
+        await rebuild_booking_rollups()
+    except Exception:
+        # Release the claim so the next start retries
+        await db.migrations.delete_one({"_id": ROLLUP_BACKFILL_MARKER})
+        raise
+    await mark_booking_rollups_backfilled()
+
+async def mark_booking_rollups_backfilled():
+    await db.migrations.update_one(
+        {"_id": ROLLUP_BACKFILL_MARKER},
+        {"$set": {"status": "done", "finished_at": datetime.now(timezone.utc).isoformat()}},
+        upsert=True
+    )
+
 # ==================== BOOKINGS ROUTES ====================
 
 @api_router.post("/bookings")
@@ -794,17 +2081,6 @@ async def create_booking(booking: BookingCreate, user: Dict = Depends(get_curren
     except Exception as e:
         raise HTTPException(status_code=400, detail="Geçersiz tarih formatı")
     
-    # Check availability
-    existing = await db.bookings.find_one({
-        "field_id": booking.field_id,
-        "date": date_str,
-        "time": time_str,
-        "status": {"$in": ["paid", "confirmed", "pending"]}
-    }, {"_id": 0})
-    
-    if existing:
-        raise HTTPException(status_code=400, detail="Bu saat dolu")
-    
     # Calculate amounts - NO LOYALTY DISCOUNT
     platform_fee = 50.0
     
@@ -841,7 +2117,24 @@ async def create_booking(booking: BookingCreate, user: Dict = Depends(get_curren
     booking_dict = new_booking.model_dump()
     booking_dict['created_at'] = booking_dict['created_at'].isoformat()
     
-    await db.bookings.insert_one(booking_dict)
+    # Until the slot lock index is built (or if its build failed) fall back to a
+    # best-effort check so reservations are never completely unguarded
+    if not index_manager.is_ready(SLOT_LOCK_INDEX):
+        taken = await db.bookings.find_one(
+            {"field_id": booking.field_id, "date": date_str, "time": time_str, "slot_active": True},
+            {"_id": 1}
+        )
+        if taken:
+            raise HTTPException(status_code=400, detail="Bu saat dolu")
+    
+    # Reserve the slot atomically: the unique partial index on active
+    # (field_id, date, time) rejects a second active booking for the slot
+    try:
+        await db.bookings.insert_one(booking_dict)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Bu saat dolu")
+    
+    await record_booking_rollup(booking_dict, None, booking_dict['status'])
     
     # Create audit log for booking
     await create_audit_log(
@@ -876,16 +2169,20 @@ async def create_booking(booking: BookingCreate, user: Dict = Depends(get_curren
     }}
 
 @api_router.get("/bookings")
-async def get_bookings(user: Dict = Depends(get_current_user)):
+async def get_bookings(
+    user: Dict = Depends(get_current_user),
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None
+):
     if user['role'] == 'owner':
         # Get owner's fields
-        fields = await db.fields.find({"owner_id": user['id']}, {"_id": 0}).to_list(100)
-        field_ids = [f['id'] for f in fields]
-        bookings = await db.bookings.find({"field_id": {"$in": field_ids}}, {"_id": 0}).to_list(1000)
+        field_ids = await db.fields.distinct("id", {"owner_id": user['id']})
+        query = {"field_id": {"$in": field_ids}}
     else:
-        bookings = await db.bookings.find({"user_id": user['id']}, {"_id": 0}).to_list(1000)
+        query = {"user_id": user['id']}
     
-    return {"bookings": bookings}
+    page = await paginate(db.bookings, query, {"_id": 0}, cursor, limit, legacy_limit=1000)
+    return {"bookings": page['items'], "next_cursor": page['next_cursor']}
 
 @api_router.delete("/bookings/{booking_id}")
 async def cancel_booking(booking_id: str, user: Dict = Depends(get_current_user)):
@@ -904,8 +2201,16 @@ async def cancel_booking(booking_id: str, user: Dict = Depends(get_current_user)
     if hours_until < 72:
         raise HTTPException(status_code=400, detail="Cannot cancel within 72 hours of booking")
     
-    # Update booking status
-    await db.bookings.update_one({"id": booking_id}, {"$set": {"status": "cancelled"}})
+    # Conditional transition: concurrent cancels or a racing payment callback
+    # cannot move the booking between rollup rows twice
+    previous = await db.bookings.find_one_and_update(
+        {"id": booking_id, "status": {"$in": BOOKING_ACTIVE_STATUSES}},
+        {"$set": {"status": "cancelled", "slot_active": False}},
+        projection={"_id": 0}
+    )
+    if not previous:
+        raise HTTPException(status_code=400, detail="Booking already cancelled")
+    await record_booking_rollup(previous, previous['status'], "cancelled")
     
     # Simulated refund (in production, integrate with PayTR refund API)
     logger.info(f"SIMULATED REFUND: Booking {booking_id}, Amount {booking['amount']} TL")
@@ -990,6 +2295,90 @@ async def simulate_payment(merchant_oid: str):
     </html>
     """)
 
+@job_queue.handler("payment_confirmed")
+async def payment_confirmed_job(payload: Dict):
+    """Side effects of a confirmed payment; each step is safe to retry"""
+    booking = payload['booking']
+    merchant_oid = payload['merchant_oid']
+    
+    # Create transaction
+    transaction = Transaction(
+        booking_id=booking['id'],
+        merchant_oid=merchant_oid,
+        amount=booking['amount'],
+        commission=50.0,
+        status="success"
+    )
+    trans_dict = transaction.model_dump()
+    trans_dict['created_at'] = trans_dict['created_at'].isoformat()
+    # Until the unique booking_id index is built the insert cannot detect a
+    # replay on its own, so check first (best effort, like create_booking)
+    already_recorded = False
+    if not index_manager.is_ready(TRANSACTION_BOOKING_INDEX):
+        already_recorded = bool(await db.transactions.find_one({"booking_id": booking['id']}, {"_id": 1}))
+    if not already_recorded:
+        try:
+            await db.transactions.insert_one(trans_dict)
+        except DuplicateKeyError:
+            # Unique booking_id: already recorded by an earlier attempt
+            already_recorded = True
+    
+    if already_recorded:
+        logger.info(f"Transaction for booking {booking['id']} already recorded")
+    else:
+        # Rollup moves only with the first successful transaction insert
+        await record_booking_rollup(booking, "paid", "confirmed")
+    
+    # NO LOYALTY UPDATE - System removed
+    
+    # Create notification for field owner
+    field = await db.fields.find_one({"id": booking['field_id']}, {"_id": 0, "owner_id": 1})
+    if field:
+        await create_notification(
+            field['owner_id'],
+            "booking",
+            f"Yeni rezervasyon: {booking['date']} {booking['time']}",
+            notif_id=f"booking_confirmed_{booking['id']}"
+        )
+
+async def enqueue_payment_confirmed(booking: Dict) -> str:
+    """Queue payment side effects; keyed on merchant_oid so replays never double-queue"""
+    return await job_queue.enqueue(
+        "payment_confirmed",
+        {"booking": booking, "merchant_oid": booking['merchant_oid']},
+        job_id=f"payment_confirmed_{booking['merchant_oid']}"
+    )
+
+async def reconcile_confirmed_payments() -> int:
+    """Re-queue side effects for confirmed bookings whose payment job was lost
+
+    Covers a crash between the state flip in payment_callback and the job insert
+    when the provider does not retry. Deterministic job ids make this safe to
+    run while callbacks are being processed.
+    """
+    since = (datetime.now(timezone.utc) - timedelta(days=PAYMENT_RECONCILE_DAYS)).isoformat()
+    orphaned = await db.bookings.aggregate([
+        {"$match": {
+            "status": "confirmed",
+            "created_at": {"$gte": since},
+            "merchant_oid": {"$type": "string"}
+        }},
+        {"$lookup": {
+            "from": "transactions",
+            "localField": "id",
+            "foreignField": "booking_id",
+            "as": "transaction"
+        }},
+        {"$match": {"transaction": []}},
+        {"$project": {"_id": 0, "transaction": 0}}
+    ]).to_list(None)
+    
+    for booking in orphaned:
+        await enqueue_payment_confirmed(booking)
+    if orphaned:
+        logger.warning(f"Payment reconcile: re-queued {len(orphaned)} confirmed bookings without a transaction")
+    return len(orphaned)
+
 @api_router.post("/payments/callback")
 async def payment_callback(request: Request, background_tasks: BackgroundTasks):
     """PayTR callback webhook (simulated)"""
@@ -999,43 +2388,40 @@ async def payment_callback(request: Request, background_tasks: BackgroundTasks):
     merchant_oid = callback_data.get('merchant_oid')
     status = callback_data.get('status')
     
-    booking = await db.bookings.find_one({"merchant_oid": merchant_oid}, {"_id": 0})
-    if not booking:
+    if not merchant_oid:
         return PlainTextResponse("OK")
     
+    # Conditional state transition: only a paid booking moves to confirmed. An
+    # already confirmed one also matches so a retry can replay lost side effects
     if status == 'success':
-        # Update booking
-        await db.bookings.update_one({"id": booking['id']}, {"$set": {"status": "confirmed"}})
-        
-        # Create transaction
-        transaction = Transaction(
-            booking_id=booking['id'],
-            amount=booking['amount'],
-            commission=50.0,
-            status="success"
+        booking = await db.bookings.find_one_and_update(
+            {"merchant_oid": merchant_oid, "status": {"$in": ["paid", "confirmed"]}},
+            {"$set": {"status": "confirmed"}},
+            projection={"_id": 0}
         )
-        trans_dict = transaction.model_dump()
-        trans_dict['created_at'] = trans_dict['created_at'].isoformat()
-        await db.transactions.insert_one(trans_dict)
+        if not booking:
+            logger.info(f"Payment callback for {merchant_oid} unknown or no longer payable")
+            return PlainTextResponse("OK")
         
-        # NO LOYALTY UPDATE - System removed
+        if booking['status'] == "confirmed":
+            if await db.transactions.find_one({"booking_id": booking['id']}, {"_id": 1}):
+                logger.info(f"Payment callback for {merchant_oid} already processed")
+                return PlainTextResponse("OK")
+            # An earlier delivery flipped the state but its job never landed
+            logger.warning(f"Replaying payment side effects for {merchant_oid}")
         
-        # Create notification for field owner
-        field = await db.fields.find_one({"id": booking['field_id']}, {"_id": 0})
-        if field:
-            notif = Notification(
-                user_id=field['owner_id'],
-                type="booking",
-                message=f"Yeni rezervasyon: {booking['date']} {booking['time']}"
-            )
-            notif_dict = notif.model_dump()
-            notif_dict['created_at'] = notif_dict['created_at'].isoformat()
-            await db.notifications.insert_one(notif_dict)
+        await enqueue_payment_confirmed(booking)
         
         logger.info(f"Payment successful for booking {booking['id']}")
     else:
-        await db.bookings.update_one({"id": booking['id']}, {"$set": {"status": "cancelled"}})
-        logger.warning(f"Payment failed for booking {booking['id']}")
+        booking = await db.bookings.find_one_and_update(
+            {"merchant_oid": merchant_oid, "status": "paid"},
+            {"$set": {"status": "cancelled", "slot_active": False}},
+            projection={"_id": 0}
+        )
+        if booking:
+            await record_booking_rollup(booking, booking['status'], "cancelled")
+            logger.warning(f"Payment failed for booking {booking['id']}")
     
     return PlainTextResponse("OK")
 
@@ -1135,12 +2521,60 @@ async def create_review(review: ReviewCreate, user: Dict = Depends(get_current_u
     return {"status": "success", "message": "Review submitted for approval"}
 
 @api_router.get("/reviews/{field_id}")
-async def get_reviews(field_id: str):
-    reviews = await db.reviews.find({"field_id": field_id, "approved": True}, {"_id": 0}).to_list(1000)
-    return {"reviews": reviews}
+async def get_reviews(field_id: str, cursor: Optional[str] = None, limit: Optional[int] = None):
+    page = await paginate(db.reviews, {"field_id": field_id, "approved": True}, {"_id": 0}, cursor, limit, legacy_limit=1000)
+    return {"reviews": page['items'], "next_cursor": page['next_cursor']}
 
 # ==================== TEAM SEARCH ROUTES ====================
 
+def team_search_start(date: str, time_str: str) -> datetime:
+    """Kick-off of a team search ad (naive UTC, like booking slots)"""
+    try:
+        return datetime.strptime(f"{date} {time_str}", "%Y-%m-%d %H:%M")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Geçersiz tarih veya saat formatı")
+
+def team_search_schedule(date: str, time_str: str) -> Dict[str, Any]:
+    """starts_at for window queries and expires_at for the TTL index"""
+    starts_at = team_search_start(date, time_str)
+    return {
+        "starts_at": starts_at.strftime(TEAM_SEARCH_STARTS_AT_FORMAT),
+        "expires_at": (starts_at + timedelta(hours=TEAM_SEARCH_EXPIRY_HOURS)).replace(tzinfo=timezone.utc)
+    }
+
+async def backfill_team_search_feed():
+    """Fill the denormalized feed fields on ads created before they existed"""
+    legacy = await db.team_searches.find(
+        {"starts_at": {"$exists": False}},
+        {"_id": 0, "id": 1, "user_id": 1, "field_id": 1, "date": 1, "time": 1,
+         "location_city": 1, "location_district": 1}
+    ).to_list(None)
+    if not legacy:
+        return
+    
+    fields = await fetch_by_ids(db.fields, (s.get('field_id') for s in legacy), ["name", "city"])
+    users = await fetch_by_ids(db.users, (s['user_id'] for s in legacy), ["name"])
+    updates = []
+    for search in legacy:
+        try:
+            update = team_search_schedule(search['date'], search['time'])
+        except HTTPException:
+            # Unparseable legacy date: expire it with the next TTL pass
+            update = {"starts_at": "", "expires_at": datetime.now(timezone.utc)}
+        field = fields.get(search.get('field_id'))
+        update.update({
+            "creator_name": users.get(search['user_id'], {}).get('name'),
+            "field_name": field['name'] if field else None,
+            "field_city": field['city'] if field else None,
+            "city": field['city'] if field else search.get('location_city'),
+            "district": None if field else search.get('location_district')
+        })
+        updates.append(UpdateOne({"id": search['id']}, {"$set": update}))
+    
+    await db.team_searches.bulk_write(updates, ordered=False)
+    logger.info(f"Team search feed backfill: {len(updates)} ads updated")
+
+
 @api_router.post("/team-search")
 async def create_team_search(team: TeamSearchCreate, user: Dict = Depends(get_current_user)):
     """Create a new team search ad"""
@@ -1160,9 +2594,25 @@ async def create_team_search(team: TeamSearchCreate, user: Dict = Depends(get_cu
     if not team.message or len(team.message.strip()) < 10:
         raise HTTPException(status_code=400, detail="Lütfen en az 10 karakter açıklama yazın.")
     
+    schedule = team_search_schedule(team.date, team.time)
+    if schedule['starts_at'] < datetime.now(timezone.utc).strftime(TEAM_SEARCH_STARTS_AT_FORMAT):
+        raise HTTPException(status_code=400, detail="Geçmiş bir tarih için ilan oluşturulamaz.")
+    
+    field = None
+    if team.field_id:
+        field = await db.fields.find_one({"id": team.field_id}, {"_id": 0, "name": 1, "city": 1})
+        if not field:
+            raise HTTPException(status_code=404, detail="Saha bulunamadı")
+    
     new_team = TeamSearch(
         user_id=user['id'],
-        **team.model_dump()
+        **team.model_dump(),
+        **schedule,
+        city=field['city'] if field else team.location_city,
+        district=None if field else team.location_district,
+        creator_name=user['name'],
+        field_name=field['name'] if field else None,
+        field_city=field['city'] if field else None
     )
     
     team_dict = new_team.model_dump()
@@ -1179,67 +2629,76 @@ async def create_team_search(team: TeamSearchCreate, user: Dict = Depends(get_cu
 @api_router.get("/team-search")
 async def get_team_searches(
     city: Optional[str] = None,
+    district: Optional[str] = None,
+    field_id: Optional[str] = None,
     position: Optional[str] = None,
-    intensity: Optional[str] = None
+    intensity: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_LIMIT
 ):
-    query = {}
+    """Upcoming team search ads, soonest first; past games are never returned"""
+    limit = max(1, min(limit, MAX_PAGE_LIMIT))
+    
+    window_start = datetime.now(timezone.utc).strftime(TEAM_SEARCH_STARTS_AT_FORMAT)
+    if date_from:
+        window_start = max(window_start, team_search_start(date_from, "00:00").strftime(TEAM_SEARCH_STARTS_AT_FORMAT))
+    starts_at = {"$gte": window_start}
+    if date_to:
+        starts_at["$lte"] = team_search_start(date_to, "23:59").strftime(TEAM_SEARCH_STARTS_AT_FORMAT)
+    
+    query = {"starts_at": starts_at}
     if city:
-        query['location_city'] = city
+        query['city'] = city
+    if district:
+        query['district'] = district
+    if field_id:
+        query['field_id'] = field_id
     if position and position != 'farketmez':
         query['position'] = position
     if intensity:
         query['intensity_level'] = intensity
     
-    searches = await db.team_searches.find(query, {"_id": 0}).sort("created_at", -1).to_list(100)
-    
-    # Enrich with field and user data
-    for search in searches:
-        if search.get('field_id'):
-            field = await db.fields.find_one({"id": search['field_id']}, {"_id": 0})
-            if field:
-                search['field_name'] = field['name']
-                search['field_city'] = field['city']
-        
-        user = await db.users.find_one({"id": search['user_id']}, {"_id": 0})
-        if user:
-            search['creator_name'] = user['name']
+    searches = await db.team_searches.find(
+        query, {"_id": 0, "expires_at": 0}
+    ).sort([("starts_at", ASCENDING), ("id", ASCENDING)]).to_list(limit)
     
     return {"team_searches": searches}
 
 @api_router.post("/team-search/{search_id}/join")
 async def join_team_search(search_id: str, user: Dict = Depends(get_current_user)):
     """Join a team search"""
-    search = await db.team_searches.find_one({"id": search_id}, {"_id": 0})
-    if not search:
-        raise HTTPException(status_code=404, detail="Search not found")
-    
-    # Check if user already joined
-    participants = search.get('participants', [])
-    if user['id'] in participants:
-        raise HTTPException(status_code=400, detail="Already joined")
-    
-    # Check if creator
-    if search['user_id'] == user['id']:
-        raise HTTPException(status_code=400, detail="Cannot join your own search")
-    
-    # Add participant
-    participants.append(user['id'])
-    await db.team_searches.update_one(
-        {"id": search_id},
-        {"$set": {"participants": participants}}
+    # Single conditional update: concurrent joins cannot overwrite each other or overfill
+    search = await db.team_searches.find_one_and_update(
+        {
+            "id": search_id,
+            "user_id": {"$ne": user['id']},
+            "participants": {"$ne": user['id']},
+            "$expr": {"$lt": [{"$size": {"$ifNull": ["$participants", []]}}, "$missing_players_count"]}
+        },
+        {"$addToSet": {"participants": user['id']}},
+        projection={"_id": 0, "expires_at": 0},
+        return_document=ReturnDocument.AFTER
     )
     
+    if not search:
+        # Slow path only on rejection: work out which guard failed
+        search = await db.team_searches.find_one(
+            {"id": search_id},
+            {"_id": 0, "user_id": 1, "participants": 1}
+        )
+        if not search:
+            raise HTTPException(status_code=404, detail="Search not found")
+        if search['user_id'] == user['id']:
+            raise HTTPException(status_code=400, detail="Cannot join your own search")
+        if user['id'] in search.get('participants', []):
+            raise HTTPException(status_code=400, detail="Already joined")
+        raise HTTPException(status_code=400, detail="Kadro dolu")
+    
     # Create notification for creator
-    notif = Notification(
-        user_id=search['user_id'],
-        type="team",
-        message=f"{user['name']} takım aramanıza katıldı!"
-    )
-    notif_dict = notif.model_dump()
-    notif_dict['created_at'] = notif_dict['created_at'].isoformat()
-    await db.notifications.insert_one(notif_dict)
+    await enqueue_notification(search['user_id'], "team", f"{user['name']} takım aramanıza katıldı!")
     
-    return {"status": "success", "message": "Takıma katıldınız!"}
+    return {"status": "success", "message": "Takıma katıldınız!", "team_search": search}
 
 @api_router.delete("/team-search/{search_id}")
 async def delete_team_search(search_id: str, user: Dict = Depends(get_current_user)):
@@ -1256,18 +2715,83 @@ async def delete_team_search(search_id: str, user: Dict = Depends(get_current_us
 # ==================== NOTIFICATIONS ROUTES ====================
 
 @api_router.get("/notifications")
-async def get_notifications(user: Dict = Depends(get_current_user)):
-    notifs = await db.notifications.find({"user_id": user['id']}, {"_id": 0}).sort("created_at", -1).to_list(100)
-    return {"notifications": notifs}
+async def get_notifications(
+    user: Dict = Depends(get_current_user),
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_LIMIT
+):
+    page = await paginate(db.notifications, {"user_id": user['id']}, {"_id": 0}, cursor, limit)
+    return {"notifications": page['items'], "next_cursor": page['next_cursor']}
+
+@api_router.get("/notifications/unread-count")
+async def get_notifications_unread_count(user: Dict = Depends(get_current_user)):
+    return {"unread": await get_unread_count(user['id'])}
+
+@api_router.get("/notifications/stream")
+async def stream_notifications(request: Request, user: Dict = Depends(get_current_user)):
+    """Server-Sent Events stream of new notifications for the current user"""
+    queue = notification_hub.subscribe(user['id'])
+    
+    def sse(event: str, data: Dict) -> str:
+        return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+    
+    async def events():
+        try:
+            yield sse("unread", {"unread": await get_unread_count(user['id'])})
+            while not await request.is_disconnected():
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=NOTIFICATION_STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+                yield sse(event, data)
+        finally:
+            notification_hub.unsubscribe(user['id'], queue)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @api_router.put("/notifications/{notif_id}/read")
 async def mark_notification_read(notif_id: str, user: Dict = Depends(get_current_user)):
-    await db.notifications.update_one(
-        {"id": notif_id, "user_id": user['id']},
-        {"$set": {"read": True}}
+    result = await db.notifications.update_one(
+        {"id": notif_id, "user_id": user['id'], "read": False},
+        {"$set": {"read": True, "read_at": datetime.now(timezone.utc)}}
     )
+    if result.modified_count:
+        unread = await adjust_unread_count(user['id'], -1)
+        notification_hub.publish(user['id'], "unread", {"unread": unread})
     return {"status": "success"}
 
+@api_router.put("/notifications/read")
+async def mark_notifications_read(user: Dict = Depends(get_current_user), before: Optional[str] = None):
+    """Mark all unread notifications read, or only those created at or before `before`"""
+    query = {"user_id": user['id'], "read": False}
+    if before:
+        try:
+            before_dt = datetime.fromisoformat(before.replace('Z', '+00:00'))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Geçersiz tarih formatı")
+        if before_dt.tzinfo is None:
+            before_dt = before_dt.replace(tzinfo=timezone.utc)
+        # created_at is stored as a UTC ISO string, so normalize before comparing
+        query["created_at"] = {"$lte": before_dt.astimezone(timezone.utc).isoformat()}
+    
+    result = await db.notifications.update_many(
+        query,
+        {"$set": {"read": True, "read_at": datetime.now(timezone.utc)}}
+    )
+    # Decrement by what was actually flipped so concurrent inserts keep their count
+    if result.modified_count:
+        unread = await adjust_unread_count(user['id'], -result.modified_count)
+        notification_hub.publish(user['id'], "unread", {"unread": unread})
+    else:
+        unread = await get_unread_count(user['id'])
+    return {"status": "success", "marked": result.modified_count, "unread": unread}
+
 # ==================== OWNER PROFILE ROUTES ====================
 
 @api_router.post("/owner/profile")
@@ -1315,6 +2839,7 @@ async def create_owner_profile(profile: OwnerProfileCreate, user: Dict = Depends
             {"id": user['id']},
             {"$set": {"is_owner": True}}
         )
+        user_cache.invalidate(user['id'])
         
         logger.info(f"Owner profile updated for user {user['id']}")
         return {"status": "success", "message": "Owner profili güncellendi", "action": "updated"}
@@ -1341,6 +2866,7 @@ async def create_owner_profile(profile: OwnerProfileCreate, user: Dict = Depends
             {"id": user['id']},
             {"$set": {"is_owner": True}}
         )
+        user_cache.invalidate(user['id'])
         
         logger.info(f"Owner profile created for user {user['id']}")
         return {"status": "success", "message": "Owner profili oluşturuldu. Artık saha ekleyebilirsiniz!", "action": "created"}
@@ -1404,13 +2930,573 @@ async def debug_user_info(user: Dict = Depends(get_current_user)):
 
 # ==================== PHOTO UPLOAD ROUTES ====================
 
-@api_router.post("/fields/{field_id}/photos")
-async def upload_field_photo(
-    field_id: str,
-    file: UploadFile = File(...),
-    user: Dict = Depends(get_current_user)
-):
-    """Upload a photo for a field (Owner only)"""
+class UploadMetrics:
+    """Counters for photo upload throughput"""
+
+    def __init__(self):
+        self.completed = 0
+        self.rejected = 0
+        self.failed = 0
+        self.bytes_written = 0
+        self.total_seconds = 0.0
+
+    def record(self, size: int, seconds: float):
+        self.completed += 1
+        self.bytes_written += size
+        self.total_seconds += seconds
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "bytes_written": self.bytes_written,
+            "avg_ms": round(self.total_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+            "throughput_mb_s": round(self.bytes_written / self.total_seconds / (1024 * 1024), 2) if self.total_seconds else 0.0
+        }
+
+upload_metrics = UploadMetrics()
+
+def generate_photo_derivatives(source_path: str, out_dir: str) -> Dict[str, str]:
+    """Write resized WebP derivatives of source_path into out_dir (runs in a worker process)"""
+    source = Path(source_path)
+    stem = source.name.rsplit('.', 1)[0]
+    derivatives = {}
+    with Image.open(source) as original:
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ("RGB", "RGBA"):
+            original = original.convert("RGBA" if "transparency" in original.info else "RGB")
+        for name, max_edge in PHOTO_DERIVATIVES.items():
+            image = original.copy()
+            image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+            filename = f"{stem}_{name}.webp"
+            image.save(Path(out_dir) / filename, "WEBP", quality=PHOTO_DERIVATIVE_QUALITY, method=4)
+            derivatives[name] = filename
+    return derivatives
+
+def derivative_filenames(filename: str) -> List[str]:
+    stem = filename.rsplit('.', 1)[0]
+    return [f"{stem}_{name}.webp" for name in PHOTO_DERIVATIVES]
+
+def photo_etag(filename: str, stat_result: os.stat_result) -> str:
+    """Strong validator for an immutable photo file"""
+    raw = f"{filename}:{stat_result.st_size}:{stat_result.st_mtime_ns}"
+    return '"' + hashlib.sha1(raw.encode('utf-8')).hexdigest() + '"'
+
+def photo_not_modified(request: Request, etag: str, mtime: float) -> bool:
+    """Evaluate If-None-Match (preferred) or If-Modified-Since"""
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        candidates = [tag.strip() for tag in if_none_match.split(',')]
+        # Weak comparison is correct for GET/HEAD
+        return '*' in candidates or any(tag.removeprefix('W/') == etag for tag in candidates)
+    
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return int(mtime) <= since.timestamp()
+    return False
+
+def parse_byte_range(range_header: str, size: int) -> Optional[tuple]:
+    """Parse a single `bytes=` range into inclusive (start, end); None means serve the whole file"""
+    unit, _, spec = range_header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    start_text, _, end_text = spec.strip().partition('-')
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+        else:
+            # Suffix range: the last N bytes
+            length = int(end_text)
+            if length <= 0:
+                raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+            start, end = max(size - length, 0), size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    return start, min(end, size - 1)
+
+async def iter_file_range(file_path: Path, start: int, end: int, chunk_size: int = 64 * 1024):
+    with await asyncio.to_thread(open, file_path, 'rb') as handle:
+        await asyncio.to_thread(handle.seek, start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await asyncio.to_thread(handle.read, min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+# Photo storage backends
+
+class LocalPhotoStorage:
+    """Stores photos under UPLOADS_DIR and serves them from this process"""
+
+    kind = "local"
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    async def save(self, tmp_path: Path, key: str) -> bool:
+        """Move a finished temp file to key; returns False if the key already existed"""
+        dest_path = self.root / key
+        if await asyncio.to_thread(dest_path.exists):
+            # Same bytes already stored; keep the existing file (and its validators)
+            await asyncio.to_thread(tmp_path.unlink, True)
+            return False
+        # Atomic rename so readers never see a partially written photo
+        await asyncio.to_thread(os.replace, tmp_path, dest_path)
+        return True
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread((self.root / key).exists)
+
+    async def head(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            stat_result = await asyncio.to_thread(os.stat, self.root / key)
+        except FileNotFoundError:
+            return None
+        return {"size": stat_result.st_size, "content_type": mimetypes.guess_type(key)[0]}
+
+    async def delete(self, keys: List[str]):
+        def unlink_all():
+            for key in keys:
+                try:
+                    (self.root / key).unlink(missing_ok=True)
+                except OSError as e:
+                    logger.error(f"File deletion error: {e}")
+        await asyncio.to_thread(unlink_all)
+
+    async def list_entries(self) -> List[tuple]:
+        """(key, mtime) for every stored file, including temp files"""
+        def scan():
+            return [(entry.name, entry.stat().st_mtime) for entry in os.scandir(self.root) if entry.is_file()]
+        return await asyncio.to_thread(scan)
+
+    @asynccontextmanager
+    async def local_copy(self, key: str):
+        yield self.root / key
+
+    async def presign_upload(self, key: str, content_type: str, size: int, sha256_hex: str) -> Dict[str, Any]:
+        raise HTTPException(status_code=400, detail="Doğrudan yükleme bu depolama ile desteklenmiyor")
+
+    async def serve(self, key: str, request: Request) -> Response:
+        file_path = self.root / key
+        try:
+            stat_result = await asyncio.to_thread(os.stat, file_path)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Fotoğraf bulunamadı")
+        
+        etag = photo_etag(key, stat_result)
+        headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+            "Cache-Control": PHOTO_CACHE_CONTROL,
+            "Accept-Ranges": "bytes"
+        }
+        
+        if photo_not_modified(request, etag, stat_result.st_mtime):
+            return Response(status_code=304, headers=headers)
+        
+        range_header = request.headers.get('range')
+        if_range = request.headers.get('if-range')
+        if range_header and (if_range is None or if_range.strip() == etag):
+            byte_range = parse_byte_range(range_header, stat_result.st_size)
+            if byte_range:
+                start, end = byte_range
+                headers["Content-Range"] = f"bytes {start}-{end}/{stat_result.st_size}"
+                headers["Content-Length"] = str(end - start + 1)
+                return StreamingResponse(
+                    iter_file_range(file_path, start, end),
+                    status_code=206,
+                    headers=headers,
+                    media_type=mimetypes.guess_type(key)[0] or "application/octet-stream"
+                )
+        
+        return FileResponse(file_path, headers=headers, stat_result=stat_result)
+
+class S3PhotoStorage:
+    """Stores photos in an S3-compatible bucket (AWS S3, MinIO, moto)"""
+
+    kind = "s3"
+
+    def __init__(self, bucket: str, prefix: str, endpoint_url: Optional[str], region: Optional[str],
+                 public_base_url: Optional[str], presign_expires: int):
+        import boto3
+        from botocore.config import Config
+        from botocore.exceptions import ClientError
+        
+        self.bucket = bucket
+        self.prefix = prefix
+        self.public_base_url = public_base_url.rstrip('/') if public_base_url else None
+        self.presign_expires = presign_expires
+        # SigV4 so the content type, length and checksum are part of presigned signatures
+        self.client = boto3.client(
+            's3',
+            endpoint_url=endpoint_url,
+            region_name=region,
+            config=Config(signature_version='s3v4')
+        )
+        self.client_error = ClientError
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    async def head(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            result = await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=self._key(key))
+        except self.client_error as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return {"size": result['ContentLength'], "content_type": result.get('ContentType')}
+
+    async def exists(self, key: str) -> bool:
+        return await self.head(key) is not None
+
+    async def save(self, tmp_path: Path, key: str) -> bool:
+        try:
+            if await self.exists(key):
+                return False
+            await asyncio.to_thread(
+                self.client.upload_file,
+                str(tmp_path),
+                self.bucket,
+                self._key(key),
+                ExtraArgs={
+                    "ContentType": mimetypes.guess_type(key)[0] or "application/octet-stream",
+                    "CacheControl": PHOTO_CACHE_CONTROL
+                }
+            )
+            return True
+        finally:
+            await asyncio.to_thread(tmp_path.unlink, True)
+
+    async def delete(self, keys: List[str]):
+        if not keys:
+            return
+        await asyncio.to_thread(
+            self.client.delete_objects,
+            Bucket=self.bucket,
+            Delete={"Objects": [{"Key": self._key(key)} for key in keys], "Quiet": True}
+        )
+
+    async def list_entries(self) -> List[tuple]:
+        def scan():
+            entries = []
+            paginator = self.client.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+                for obj in page.get('Contents', []):
+                    entries.append((obj['Key'][len(self.prefix):], obj['LastModified'].timestamp()))
+            return entries
+        return await asyncio.to_thread(scan)
+
+    @asynccontextmanager
+    async def local_copy(self, key: str):
+        tmp_path = UPLOADS_DIR / f".download.{uuid.uuid4().hex}.part"
+        try:
+            await asyncio.to_thread(self.client.download_file, self.bucket, self._key(key), str(tmp_path))
+            yield tmp_path
+        finally:
+            await asyncio.to_thread(tmp_path.unlink, True)
+
+    async def presign_upload(self, key: str, content_type: str, size: int, sha256_hex: str) -> Dict[str, Any]:
+        """Presigned PUT; the signed checksum makes storage reject bytes that do not match the key"""
+        checksum = base64.b64encode(bytes.fromhex(sha256_hex)).decode('ascii')
+        url = await asyncio.to_thread(
+            self.client.generate_presigned_url,
+            'put_object',
+            Params={
+                "Bucket": self.bucket,
+                "Key": self._key(key),
+                "ContentType": content_type,
+                "ContentLength": size,
+                "ChecksumSHA256": checksum,
+                "CacheControl": PHOTO_CACHE_CONTROL
+            },
+            ExpiresIn=self.presign_expires
+        )
+        return {
+            "method": "PUT",
+            "url": url,
+            "headers": {
+                "Content-Type": content_type,
+                "x-amz-checksum-sha256": checksum,
+                "Cache-Control": PHOTO_CACHE_CONTROL
+            },
+            "expires_in": self.presign_expires
+        }
+
+    async def serve(self, key: str, request: Request) -> Response:
+        # Bytes go straight from storage to the browser
+        if self.public_base_url:
+            return RedirectResponse(
+                f"{self.public_base_url}/{self._key(key)}",
+                status_code=301,
+                headers={"Cache-Control": PHOTO_CACHE_CONTROL}
+            )
+        url = await asyncio.to_thread(
+            self.client.generate_presigned_url,
+            'get_object',
+            Params={"Bucket": self.bucket, "Key": self._key(key)},
+            ExpiresIn=self.presign_expires
+        )
+        # Cache the redirect for less time than the signature lives
+        return RedirectResponse(
+            url,
+            status_code=307,
+            headers={"Cache-Control": f"private, max-age={max(self.presign_expires - 60, 0)}"}
+        )
+
+def create_photo_storage():
+    if PHOTO_STORAGE == "s3":
+        return S3PhotoStorage(
+            bucket=os.environ['S3_BUCKET'],
+            prefix=os.environ.get('S3_PREFIX', 'photos/'),
+            endpoint_url=os.environ.get('S3_ENDPOINT_URL'),
+            region=os.environ.get('S3_REGION'),
+            public_base_url=os.environ.get('S3_PUBLIC_BASE_URL'),
+            presign_expires=int(os.environ.get('S3_PRESIGN_EXPIRES', '900'))
+        )
+    return LocalPhotoStorage(UPLOADS_DIR)
+
+photo_storage = create_photo_storage()
+
+class ImageWorkerPool:
+    """Process pool that builds photo derivatives off the request path"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def build_derivatives(self, field_id: str, photo_url: str):
+        """Generate derivatives for a stored photo and attach their URLs to the field"""
+        if Image is None:
+            logger.warning("Pillow is not installed; skipping photo derivatives")
+            return
+        
+        filename = photo_url.split('/')[-1]
+        names = derivative_filenames(filename)
+        derivatives = dict(zip(PHOTO_DERIVATIVES, names))
+        
+        self.pending += 1
+        try:
+            # Content-addressed originals share derivatives across fields
+            existing = await asyncio.gather(*(photo_storage.exists(name) for name in names))
+            if not all(existing):
+                out_dir = Path(await asyncio.to_thread(tempfile.mkdtemp, prefix=".derivatives.", dir=UPLOADS_DIR))
+                try:
+                    async with photo_storage.local_copy(filename) as source_path:
+                        loop = asyncio.get_running_loop()
+                        derivatives = await loop.run_in_executor(
+                            self._get_executor(), generate_photo_derivatives, str(source_path), str(out_dir)
+                        )
+                    for derivative in derivatives.values():
+                        await photo_storage.save(out_dir / derivative, derivative)
+                finally:
+                    await asyncio.to_thread(shutil.rmtree, out_dir, True)
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Photo derivative generation failed for {photo_url}: {e}")
+            return
+        finally:
+            self.pending -= 1
+        
+        entry = {"photo_url": photo_url}
+        entry.update({name: f"/api/uploads/photos/{derivative}" for name, derivative in derivatives.items()})
+        
+        # Only attach if the photo was not deleted while derivatives were built;
+        # files left unreferenced are reclaimed by the photo garbage collector
+        await db.fields.update_one(
+            {"id": field_id, "photos": photo_url, "photo_derivatives.photo_url": {"$ne": photo_url}},
+            {"$push": {"photo_derivatives": entry}}
+        )
+        self.completed += 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "available": Image is not None,
+            "pending": self.pending,
+            "completed": self.completed,
+            "failed": self.failed
+        }
+
+image_workers = ImageWorkerPool(IMAGE_WORKERS)
+
+async def stream_upload_to_temp(upload: UploadFile, max_bytes: int) -> tuple:
+    """Copy an upload to a temp file in chunks off the event loop, hashing as it streams.
+    
+    Returns (tmp_path, size, sha256 hex digest); stops copying past max_bytes.
+    The upload is already spooled by Starlette, so this bounds the copy, not the
+    network transfer.
+    """
+    tmp_path = UPLOADS_DIR / f".upload.{uuid.uuid4().hex}.part"
+    digest = hashlib.sha256()
+    size = 0
+    buffer = await asyncio.to_thread(open, tmp_path, 'wb')
+    try:
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(status_code=400, detail="Dosya boyutu en fazla 5 MB olabilir.")
+            digest.update(chunk)
+            await asyncio.to_thread(buffer.write, chunk)
+        await asyncio.to_thread(buffer.close)
+    except Exception:
+        buffer.close()
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return tmp_path, size, digest.hexdigest()
+
+async def register_photo_blob(filename: str, size: int):
+    """Take a reference on a content-addressed blob"""
+    await db.photo_blobs.update_one(
+        {"_id": filename},
+        {
+            "$inc": {"refs": 1},
+            "$setOnInsert": {"size": size, "created_at": datetime.now(timezone.utc).isoformat()}
+        },
+        upsert=True
+    )
+
+async def store_photo_blob(tmp_path: Path, filename: str, size: int):
+    """Take a reference on a blob, moving tmp_path into storage if the bytes are new"""
+    await register_photo_blob(filename, size)
+    await photo_storage.save(tmp_path, filename)
+
+async def release_photo_blob(photo_url: str):
+    """Drop one reference to a photo, deleting its files once nothing references it"""
+    filename = photo_url.split('/')[-1]
+    blob = await db.photo_blobs.find_one_and_update(
+        {"_id": filename},
+        {"$inc": {"refs": -1}},
+        return_document=ReturnDocument.AFTER
+    )
+    if blob is None:
+        # Legacy per-field file ({field_id}_{timestamp}.ext) without a blob record
+        await photo_storage.delete([filename] + derivative_filenames(filename))
+        return
+    
+    if blob['refs'] <= 0:
+        # Conditional delete so a concurrent upload of the same bytes keeps the blob
+        result = await db.photo_blobs.delete_one({"_id": filename, "refs": {"$lte": 0}})
+        if result.deleted_count:
+            await photo_storage.delete([filename] + derivative_filenames(filename))
+
+async def collect_photo_garbage(grace_seconds: int = PHOTO_GC_GRACE_SECONDS) -> Dict[str, int]:
+    """Reconcile blob reference counts with fields and delete unreferenced photo files"""
+    ref_rows = await db.fields.aggregate([
+        {"$unwind": "$photos"},
+        {"$group": {"_id": "$photos", "refs": {"$sum": 1}}}
+    ]).to_list(None)
+    refs = {row['_id'].split('/')[-1]: row['refs'] for row in ref_rows}
+    referenced_stems = {name.rsplit('.', 1)[0] for name in refs}
+    
+    cutoff = time.time() - grace_seconds
+    cutoff_iso = datetime.fromtimestamp(cutoff, timezone.utc).isoformat()
+    
+    # Reconcile counters that drifted (e.g. a crash between file and field writes).
+    # Young blobs may still be mid-upload, and the update is conditional on the
+    # value read so a register/release racing the fields snapshot is not overwritten
+    reconciled = 0
+    async for blob in db.photo_blobs.find({"created_at": {"$lt": cutoff_iso}}, {"_id": 1, "refs": 1}):
+        actual = refs.get(blob['_id'], 0)
+        if blob.get('refs') != actual:
+            result = await db.photo_blobs.update_one(
+                {"_id": blob['_id'], "refs": blob.get('refs')},
+                {"$set": {"refs": actual}}
+            )
+            reconciled += result.modified_count
+    
+    derivative_suffixes = tuple(f"_{name}.webp" for name in PHOTO_DERIVATIVES)
+    
+    orphaned = []
+    for key, mtime in await photo_storage.list_entries():
+        if mtime > cutoff:
+            continue
+        if key.startswith('.'):
+            # Stale temp file from an aborted upload
+            stem = None
+        elif key.endswith(derivative_suffixes):
+            stem = key.rsplit('_', 1)[0]
+        else:
+            stem = key.rsplit('.', 1)[0]
+        if stem is None or stem not in referenced_stems:
+            orphaned.append((key, stem))
+    
+    # Keep files whose blob gained a reference after the fields snapshot
+    # (e.g. a confirm of bytes that were already stored)
+    extensions = set(PHOTO_EXTENSIONS.values())
+    candidate_ids = [f"{stem}.{ext}" for stem in {stem for _, stem in orphaned if stem} for ext in extensions]
+    live_stems = set()
+    for i in range(0, len(candidate_ids), 1000):
+        async for blob in db.photo_blobs.find({"_id": {"$in": candidate_ids[i:i + 1000]}, "refs": {"$gt": 0}}, {"_id": 1}):
+            live_stems.add(blob['_id'].rsplit('.', 1)[0])
+    orphaned = [key for key, stem in orphaned if stem is None or stem not in live_stems]
+    
+    # Batch deletes (S3 DeleteObjects accepts up to 1000 keys)
+    for i in range(0, len(orphaned), 1000):
+        await photo_storage.delete(orphaned[i:i + 1000])
+    
+    removed_blobs = (await db.photo_blobs.delete_many({"refs": {"$lte": 0}, "created_at": {"$lt": cutoff_iso}})).deleted_count
+    logger.info(f"Photo GC: {len(orphaned)} files removed, {removed_blobs} blobs dropped, {reconciled} counters reconciled")
+    return {"removed_files": len(orphaned), "removed_blobs": removed_blobs, "reconciled": reconciled}
+
+async def attach_field_photo(field: Dict, photo_url: str, background_tasks: BackgroundTasks) -> bool:
+    """Append a stored photo to a field and queue its derivatives
+
+    The caller has already taken a blob reference; it is released again when
+    the photo is not attached. Returns False if the field already has it.
+    """
+    # Conditional $push: concurrent uploads cannot drop each other's URL or exceed 10
+    result = await db.fields.update_one(
+        {"id": field['id'], "photos.9": {"$exists": False}, "photos": {"$ne": photo_url}},
+        {"$push": {"photos": photo_url}}
+    )
+    if not result.matched_count:
+        await release_photo_blob(photo_url)
+        current = await db.fields.find_one({"id": field['id']}, {"_id": 0, "photos": 1})
+        if current and photo_url in current.get('photos', []):
+            return False
+        raise HTTPException(status_code=400, detail="En fazla 10 fotoğraf yükleyebilirsiniz.")
+    
+    # If there is no cover yet, this photo becomes it
+    await db.fields.update_one(
+        {"id": field['id'], "cover_photo_url": None},
+        {"$set": {"cover_photo_url": photo_url}}
+    )
+    
+    # Build thumbnail/card/full WebP derivatives after the response is sent
+    background_tasks.add_task(image_workers.build_derivatives, field['id'], photo_url)
+    return True
+
+async def get_owned_field_for_photo_upload(field_id: str, user: Dict) -> Dict:
+    """Owner/ownership/photo-count checks shared by all upload paths"""
     # Check if user is owner
     if user['role'] != 'owner':
         raise HTTPException(status_code=403, detail="Sadece saha sahipleri fotoğraf yükleyebilir")
@@ -1420,49 +3506,133 @@ async def upload_field_photo(
     if not field:
         raise HTTPException(status_code=404, detail="Saha bulunamadı veya size ait değil")
     
-    # Validate file type
-    allowed_types = ['image/jpeg', 'image/jpg', 'image/png', 'image/webp']
-    if file.content_type not in allowed_types:
-        raise HTTPException(status_code=400, detail="Desteklenmeyen dosya formatı. Lütfen JPG, PNG veya WEBP yükleyin.")
-    
-    # Check file size (5MB limit)
-    file.file.seek(0, 2)  # Seek to end
-    file_size = file.file.tell()
-    file.file.seek(0)  # Reset to beginning
+    # Check photo count (max 10); attach_field_photo enforces it atomically
+    if len(field.get('photos', [])) >= 10:
+        raise HTTPException(status_code=400, detail="En fazla 10 fotoğraf yükleyebilirsiniz.")
     
-    if file_size > 5 * 1024 * 1024:  # 5MB
+    return field
+
+@api_router.post("/fields/{field_id}/photos")
+async def upload_field_photo(
+    field_id: str,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    user: Dict = Depends(get_current_user)
+):
+    """Upload a photo for a field (Owner only)"""
+    # By now Starlette has already received and spooled the whole multipart body
+    # (File(...) is parsed before the handler runs), so this cannot abort the
+    # transfer; it only skips the ownership lookup, copy and hashing for bodies
+    # whose declared length is already over the limit. Large direct uploads
+    # should use the presigned flow instead.
+    content_length = request.headers.get('content-length')
+    if content_length and content_length.isdigit() and int(content_length) > MAX_PHOTO_SIZE + UPLOAD_MULTIPART_OVERHEAD:
+        upload_metrics.rejected += 1
         raise HTTPException(status_code=400, detail="Dosya boyutu en fazla 5 MB olabilir.")
     
-    # Check photo count (max 10)
-    current_photos = field.get('photos', [])
-    if len(current_photos) >= 10:
-        raise HTTPException(status_code=400, detail="En fazla 10 fotoğraf yükleyebilirsiniz.")
+    field = await get_owned_field_for_photo_upload(field_id, user)
     
-    # Save file
-    timestamp = int(datetime.now().timestamp())
-    file_extension = file.filename.split('.')[-1] if '.' in file.filename else 'jpg'
-    filename = f"{field_id}_{timestamp}.{file_extension}"
-    file_path = UPLOADS_DIR / filename
+    # Validate file type
+    if file.content_type not in PHOTO_EXTENSIONS:
+        raise HTTPException(status_code=400, detail="Desteklenmeyen dosya formatı. Lütfen JPG, PNG veya WEBP yükleyin.")
     
+    # Copy the spooled upload to a temp file, enforcing the 5MB limit and hashing the content
+    started_at = time.monotonic()
     try:
-        with open(file_path, 'wb') as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        tmp_path, file_size, digest = await stream_upload_to_temp(file, MAX_PHOTO_SIZE)
+    except HTTPException:
+        upload_metrics.rejected += 1
+        raise
     except Exception as e:
+        upload_metrics.failed += 1
         logger.error(f"File upload error: {e}")
         raise HTTPException(status_code=500, detail="Fotoğraf yüklenemedi, lütfen tekrar deneyin.")
     
-    # Generate URL
+    # Content-addressed name: identical images share one file across fields
+    filename = f"{digest}.{PHOTO_EXTENSIONS[file.content_type]}"
     photo_url = f"/api/uploads/photos/{filename}"
     
-    # Update field photos
-    current_photos.append(photo_url)
-    update_data = {"photos": current_photos}
+    if photo_url in field.get('photos', []):
+        await asyncio.to_thread(tmp_path.unlink, True)
+        return {
+            "status": "success",
+            "photo_url": photo_url,
+            "message": "Fotoğraf zaten yüklü"
+        }
+    
+    try:
+        await store_photo_blob(tmp_path, filename, file_size)
+    except Exception as e:
+        upload_metrics.failed += 1
+        await asyncio.to_thread(tmp_path.unlink, True)
+        logger.error(f"File upload error: {e}")
+        raise HTTPException(status_code=500, detail="Fotoğraf yüklenemedi, lütfen tekrar deneyin.")
+    upload_metrics.record(file_size, time.monotonic() - started_at)
+    
+    if not await attach_field_photo(field, photo_url, background_tasks):
+        return {"status": "success", "photo_url": photo_url, "message": "Fotoğraf zaten yüklü"}
+    
+    return {
+        "status": "success",
+        "photo_url": photo_url,
+        "message": "Fotoğraf başarıyla yüklendi"
+    }
+
+@api_router.post("/fields/{field_id}/photos/presign")
+async def presign_field_photo_upload(
+    field_id: str,
+    intent: PhotoUploadIntent,
+    user: Dict = Depends(get_current_user)
+):
+    """Get a presigned direct-to-storage upload for a photo (Owner only)"""
+    field = await get_owned_field_for_photo_upload(field_id, user)
+    
+    if intent.content_type not in PHOTO_EXTENSIONS:
+        raise HTTPException(status_code=400, detail="Desteklenmeyen dosya formatı. Lütfen JPG, PNG veya WEBP yükleyin.")
+    if intent.size <= 0 or intent.size > MAX_PHOTO_SIZE:
+        raise HTTPException(status_code=400, detail="Dosya boyutu en fazla 5 MB olabilir.")
+    sha256_hex = intent.sha256.lower()
+    if not PHOTO_KEY_PATTERN.match(f"{sha256_hex}.jpg"):
+        raise HTTPException(status_code=400, detail="Geçersiz SHA-256 özeti")
+    
+    key = f"{sha256_hex}.{PHOTO_EXTENSIONS[intent.content_type]}"
+    if f"/api/uploads/photos/{key}" in field.get('photos', []):
+        return {"status": "success", "key": key, "upload": None, "message": "Fotoğraf zaten yüklü"}
+    
+    # Identical bytes are already stored; the client only needs to confirm
+    if await photo_storage.exists(key):
+        return {"status": "success", "key": key, "upload": None}
+    
+    upload = await photo_storage.presign_upload(key, intent.content_type, intent.size, sha256_hex)
+    return {"status": "success", "key": key, "upload": upload}
+
+@api_router.post("/fields/{field_id}/photos/confirm")
+async def confirm_field_photo_upload(
+    field_id: str,
+    confirm: PhotoUploadConfirm,
+    background_tasks: BackgroundTasks,
+    user: Dict = Depends(get_current_user)
+):
+    """Attach a photo uploaded directly to storage (Owner only)"""
+    field = await get_owned_field_for_photo_upload(field_id, user)
+    
+    if not PHOTO_KEY_PATTERN.match(confirm.key):
+        raise HTTPException(status_code=400, detail="Geçersiz fotoğraf anahtarı")
     
-    # If this is the first photo, set it as cover
-    if len(current_photos) == 1:
-        update_data["cover_photo_url"] = photo_url
+    photo_url = f"/api/uploads/photos/{confirm.key}"
+    if photo_url in field.get('photos', []):
+        return {"status": "success", "photo_url": photo_url, "message": "Fotoğraf zaten yüklü"}
+    
+    stored = await photo_storage.head(confirm.key)
+    if not stored:
+        raise HTTPException(status_code=404, detail="Yüklenen fotoğraf bulunamadı")
+    if stored['size'] > MAX_PHOTO_SIZE:
+        raise HTTPException(status_code=400, detail="Dosya boyutu en fazla 5 MB olabilir.")
     
-    await db.fields.update_one({"id": field_id}, {"$set": update_data})
+    await register_photo_blob(confirm.key, stored['size'])
+    if not await attach_field_photo(field, photo_url, background_tasks):
+        return {"status": "success", "photo_url": photo_url, "message": "Fotoğraf zaten yüklü"}
     
     return {
         "status": "success",
@@ -1486,30 +3656,33 @@ async def delete_field_photo(
     if not field:
         raise HTTPException(status_code=404, detail="Saha bulunamadı")
     
-    # Remove photo from list
-    photos = field.get('photos', [])
-    if photo_url not in photos:
+    # Remove photo, its derivatives and (if it was the cover) pick a new cover in
+    # one conditional pipeline update, so concurrent edits are not overwritten
+    result = await db.fields.update_one(
+        {"id": field_id, "owner_id": user['id'], "photos": photo_url},
+        [
+            {"$set": {
+                "photos": {"$filter": {
+                    "input": "$photos",
+                    "cond": {"$ne": ["$$this", photo_url]}
+                }},
+                "photo_derivatives": {"$filter": {
+                    "input": {"$ifNull": ["$photo_derivatives", []]},
+                    "cond": {"$ne": ["$$this.photo_url", photo_url]}
+                }}
+            }},
+            {"$set": {"cover_photo_url": {"$cond": [
+                {"$eq": ["$cover_photo_url", photo_url]},
+                {"$ifNull": [{"$arrayElemAt": ["$photos", 0]}, None]},
+                "$cover_photo_url"
+            ]}}}
+        ]
+    )
+    if not result.matched_count:
         raise HTTPException(status_code=404, detail="Fotoğraf bulunamadı")
     
-    photos.remove(photo_url)
-    
-    # Delete file
-    try:
-        filename = photo_url.split('/')[-1]
-        file_path = UPLOADS_DIR / filename
-        if file_path.exists():
-            file_path.unlink()
-    except Exception as e:
-        logger.error(f"File deletion error: {e}")
-    
-    # Update field
-    update_data = {"photos": photos}
-    
-    # If deleted photo was cover, set new cover
-    if field.get('cover_photo_url') == photo_url:
-        update_data["cover_photo_url"] = photos[0] if photos else None
-    
-    await db.fields.update_one({"id": field_id}, {"$set": update_data})
+    # Files are only removed once no field references the blob
+    await release_photo_blob(photo_url)
     
     return {"status": "success", "message": "Fotoğraf silindi"}
 
@@ -1540,35 +3713,66 @@ async def set_cover_photo(
     return {"status": "success", "message": "Kapak fotoğrafı güncellendi"}
 
 @api_router.get("/uploads/photos/{filename}")
-async def get_photo(filename: str):
-    """Serve uploaded photos"""
-    file_path = UPLOADS_DIR / filename
-    if not file_path.exists():
+async def get_photo(filename: str, request: Request):
+    """Serve uploaded photos with validators, long-lived caching and byte ranges"""
+    # Only plain, finished files (temp uploads start with a dot)
+    if Path(filename).name != filename or filename.startswith('.'):
         raise HTTPException(status_code=404, detail="Fotoğraf bulunamadı")
     
-    return FileResponse(file_path)
+    return await photo_storage.serve(filename, request)
 
 # ==================== ADMIN ROUTES ====================
 
 @api_router.get("/admin/dashboard")
 async def admin_dashboard(admin: Dict = Depends(get_admin_user)):
     """Get admin dashboard statistics"""
-    # Count statistics
-    total_users = await db.users.count_documents({})
-    total_owners = await db.users.count_documents({"role": "owner"})
-    total_fields = await db.fields.count_documents({})
-    pending_fields = await db.fields.count_documents({"approved": False})
-    total_bookings = await db.bookings.count_documents({})
-    
-    # Revenue calculations
-    bookings = await db.bookings.find({"status": {"$in": ["paid", "confirmed"]}}, {"_id": 0}).to_list(10000)
-    total_revenue = sum(b.get('total_amount_user_paid', 0) for b in bookings)
-    platform_revenue = sum(b.get('platform_fee_amount', 50) for b in bookings)
-    owner_revenue = sum(b.get('owner_share_amount', 0) for b in bookings)
-    
-    # Get recent activities
-    recent_fields = await db.fields.find({}, {"_id": 0}).sort("created_at", -1).limit(5).to_list(5)
-    recent_bookings = await db.bookings.find({}, {"_id": 0}).sort("created_at", -1).limit(5).to_list(5)
+    # Booking totals come from the pre-aggregated rollups; user and field
+    # counts from one $facet each. All reads are issued concurrently
+    rollups_pipeline = [
+        {"$group": {
+            "_id": None,
+            "total_bookings": {"$sum": "$count"},
+            "total_revenue": {"$sum": {"$cond": [{"$in": ["$status", REVENUE_STATUSES]}, "$gross", 0]}},
+            "platform_revenue": {"$sum": {"$cond": [{"$in": ["$status", REVENUE_STATUSES]}, "$platform_fee", 0]}},
+            "owner_revenue": {"$sum": {"$cond": [{"$in": ["$status", REVENUE_STATUSES]}, "$owner_share", 0]}}
+        }}
+    ]
+    users_pipeline = [
+        {"$facet": {
+            "total": [{"$count": "count"}],
+            "owners": [{"$match": {"role": "owner"}}, {"$count": "count"}]
+        }}
+    ]
+    fields_pipeline = [
+        {"$facet": {
+            "total": [{"$count": "count"}],
+            "pending": [{"$match": {"approved": False}}, {"$count": "count"}]
+        }}
+    ]
+    
+    rollup_totals, users_facet, fields_facet, recent_fields, recent_bookings = await asyncio.gather(
+        db.booking_rollups.aggregate(rollups_pipeline).to_list(1),
+        db.users.aggregate(users_pipeline).to_list(1),
+        db.fields.aggregate(fields_pipeline).to_list(1),
+        # Get recent activities
+        db.fields.find({}, {"_id": 0}).sort("created_at", -1).limit(5).to_list(5),
+        db.bookings.find({}, {"_id": 0}).sort("created_at", -1).limit(5).to_list(5)
+    )
+    
+    def facet_count(facet: Dict, key: str) -> int:
+        return facet[key][0]['count'] if facet.get(key) else 0
+    
+    users_facet, fields_facet = users_facet[0], fields_facet[0]
+    total_users = facet_count(users_facet, "total")
+    total_owners = facet_count(users_facet, "owners")
+    total_fields = facet_count(fields_facet, "total")
+    pending_fields = facet_count(fields_facet, "pending")
+    
+    revenue = rollup_totals[0] if rollup_totals else {}
+    total_bookings = revenue.get('total_bookings', 0)
+    total_revenue = revenue.get('total_revenue', 0)
+    platform_revenue = revenue.get('platform_revenue', 0)
+    owner_revenue = revenue.get('owner_revenue', 0)
     
     return {
         "statistics": {
@@ -1597,8 +3801,9 @@ async def admin_get_fields(admin: Dict = Depends(get_admin_user), status: Option
     fields = await db.fields.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
     
     # Enrich with owner data
+    owners = await fetch_by_ids(db.users, (f['owner_id'] for f in fields), ["name", "email", "phone"])
     for field in fields:
-        owner = await db.users.find_one({"id": field['owner_id']}, {"_id": 0})
+        owner = owners.get(field['owner_id'])
         if owner:
             field['owner_name'] = owner['name']
             field['owner_email'] = owner['email']
@@ -1634,14 +3839,7 @@ async def admin_approve_field(field_id: str, admin: Dict = Depends(get_admin_use
     )
     
     # Notify owner
-    notif = Notification(
-        user_id=field['owner_id'],
-        type="booking",
-        message=f"Sahanız '{field['name']}' onaylandı ve yayına alındı!"
-    )
-    notif_dict = notif.model_dump()
-    notif_dict['created_at'] = notif_dict['created_at'].isoformat()
-    await db.notifications.insert_one(notif_dict)
+    await enqueue_notification(field['owner_id'], "booking", f"Sahanız '{field['name']}' onaylandı ve yayına alındı!")
     
     return {"status": "success", "message": "Saha onaylandı"}
 
@@ -1663,27 +3861,25 @@ async def admin_reject_field(field_id: str, reason: str, admin: Dict = Depends(g
     )
     
     # Notify owner
-    notif = Notification(
-        user_id=field['owner_id'],
-        type="booking",
-        message=f"Sahanız '{field['name']}' reddedildi. Sebep: {reason}"
-    )
-    notif_dict = notif.model_dump()
-    notif_dict['created_at'] = notif_dict['created_at'].isoformat()
-    await db.notifications.insert_one(notif_dict)
+    await enqueue_notification(field['owner_id'], "booking", f"Sahanız '{field['name']}' reddedildi. Sebep: {reason}")
     
     return {"status": "success", "message": "Saha reddedildi"}
 
 @api_router.get("/admin/users")
-async def admin_get_users(admin: Dict = Depends(get_admin_user), role: Optional[str] = None):
+async def admin_get_users(
+    admin: Dict = Depends(get_admin_user),
+    role: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None
+):
     """Get all users"""
     query = {}
     if role:
         query["role"] = role
     
-    users = await db.users.find(query, {"_id": 0, "password": 0}).sort("created_at", -1).to_list(10000)
+    page = await paginate(db.users, query, {"_id": 0, "password": 0}, cursor, limit, legacy_limit=10000)
     
-    return {"users": users}
+    return {"users": page['items'], "next_cursor": page['next_cursor']}
 
 @api_router.post("/admin/users/{user_id}/suspend")
 async def admin_suspend_user(user_id: str, admin: Dict = Depends(get_admin_user)):
@@ -1697,6 +3893,7 @@ async def admin_suspend_user(user_id: str, admin: Dict = Depends(get_admin_user)
     
     # Add suspended flag
     await db.users.update_one({"id": user_id}, {"$set": {"suspended": True}})
+    user_cache.invalidate(user_id)
     
     # Create audit log
     await create_audit_log(
@@ -1714,6 +3911,7 @@ async def admin_suspend_user(user_id: str, admin: Dict = Depends(get_admin_user)
 async def admin_unsuspend_user(user_id: str, admin: Dict = Depends(get_admin_user)):
     """Unsuspend a user account"""
     await db.users.update_one({"id": user_id}, {"$set": {"suspended": False}})
+    user_cache.invalidate(user_id)
     
     # Create audit log
     await create_audit_log(
@@ -1739,6 +3937,7 @@ async def admin_delete_user(user_id: str, admin: Dict = Depends(get_admin_user))
     
     # Delete user
     await db.users.delete_one({"id": user_id})
+    user_cache.invalidate(user_id)
     
     # Create audit log
     await create_audit_log(
@@ -1753,66 +3952,136 @@ async def admin_delete_user(user_id: str, admin: Dict = Depends(get_admin_user))
     return {"status": "success", "message": "Kullanıcı silindi"}
 
 @api_router.get("/admin/bookings")
-async def admin_get_bookings(admin: Dict = Depends(get_admin_user)):
+async def admin_get_bookings(
+    admin: Dict = Depends(get_admin_user),
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None
+):
     """Get all bookings"""
-    bookings = await db.bookings.find({}, {"_id": 0}).sort("created_at", -1).to_list(10000)
+    page = await paginate(db.bookings, {}, {"_id": 0}, cursor, limit, legacy_limit=10000)
+    bookings = page['items']
     
     # Enrich with user and field data
+    users = await fetch_by_ids(db.users, (b['user_id'] for b in bookings), ["name", "email"])
+    fields = await fetch_by_ids(db.fields, (b['field_id'] for b in bookings), ["name", "city"])
     for booking in bookings:
-        user = await db.users.find_one({"id": booking['user_id']}, {"_id": 0})
+        user = users.get(booking['user_id'])
         if user:
             booking['user_name'] = user['name']
             booking['user_email'] = user['email']
         
-        field = await db.fields.find_one({"id": booking['field_id']}, {"_id": 0})
+        field = fields.get(booking['field_id'])
         if field:
             booking['field_name'] = field['name']
             booking['field_city'] = field['city']
     
-    return {"bookings": bookings}
+    return {"bookings": bookings, "next_cursor": page['next_cursor']}
+
+ANALYTICS_MAX_MONTHS = 36
+ANALYTICS_GROUP_BY = ["field", "city"]
+
+def month_starts(today, months: int) -> List:
+    """First day of each of the last `months` calendar months, oldest first, plus the next month's start"""
+    year, month = today.year, today.month
+    starts = []
+    for _ in range(months):
+        starts.append(today.replace(year=year, month=month, day=1))
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+    starts.reverse()
+    last = starts[-1]
+    next_start = last.replace(year=last.year + 1, month=1) if last.month == 12 else last.replace(month=last.month + 1)
+    return starts + [next_start]
 
 @api_router.get("/admin/analytics")
-async def admin_analytics(admin: Dict = Depends(get_admin_user)):
+async def admin_analytics(
+    admin: Dict = Depends(get_admin_user),
+    months: int = 12,
+    group_by: Optional[str] = None
+):
     """Get analytics data"""
-    # Get bookings by status
-    confirmed_bookings = await db.bookings.count_documents({"status": {"$in": ["paid", "confirmed"]}})
-    cancelled_bookings = await db.bookings.count_documents({"status": "cancelled"})
-    
-    # Revenue by month (last 12 months)
+    if months < 1 or months > ANALYTICS_MAX_MONTHS:
+        raise HTTPException(status_code=400, detail=f"months 1 ile {ANALYTICS_MAX_MONTHS} arasında olmalıdır")
+    if group_by and group_by not in ANALYTICS_GROUP_BY:
+        raise HTTPException(status_code=400, detail="group_by 'field' veya 'city' olmalıdır")
+    
+    # Get bookings by status from the daily rollups
+    status_rows = await db.booking_rollups.aggregate([
+        {"$group": {"_id": "$status", "count": {"$sum": "$count"}}}
+    ]).to_list(None)
+    status_counts = {row['_id']: row['count'] for row in status_rows}
+    confirmed_bookings = sum(status_counts.get(status, 0) for status in REVENUE_STATUSES)
+    cancelled_bookings = status_counts.get("cancelled", 0)
+    
+    # Revenue by calendar month in one $group over rollup days (YYYY-MM-DD,
+    # so the first 7 characters are the month bucket)
     from datetime import date
-    monthly_revenue = []
-    
-    for month_offset in range(12):
-        start_date = date.today().replace(day=1) - timedelta(days=30 * month_offset)
-        end_date = (start_date + timedelta(days=32)).replace(day=1)
-        
-        bookings = await db.bookings.find({
-            "status": {"$in": ["paid", "confirmed"]},
-            "created_at": {
-                "$gte": start_date.isoformat(),
-                "$lt": end_date.isoformat()
-            }
-        }, {"_id": 0}).to_list(10000)
-        
-        revenue = sum(b.get('total_amount_user_paid', 0) for b in bookings)
-        monthly_revenue.insert(0, {
-            "month": start_date.strftime("%Y-%m"),
-            "revenue": revenue,
-            "booking_count": len(bookings)
-        })
+    starts = month_starts(date.today(), months)
+    month_keys = [d.strftime("%Y-%m") for d in starts[:-1]]
+    
+    group_id = {"month": {"$substrCP": ["$day", 0, 7]}}
+    if group_by:
+        group_id["field_id"] = "$field_id"
+    
+    monthly_pipeline = [
+        {"$match": {
+            "status": {"$in": REVENUE_STATUSES},
+            "day": {"$gte": starts[0].isoformat(), "$lt": starts[-1].isoformat()}
+        }},
+        {"$group": {
+            "_id": group_id,
+            "revenue": {"$sum": "$gross"},
+            "booking_count": {"$sum": "$count"}
+        }}
+    ]
+    monthly_rows = await db.booking_rollups.aggregate(monthly_pipeline).to_list(None)
+    
+    buckets = {key: {"month": key, "revenue": 0, "booking_count": 0} for key in month_keys}
+    for row in monthly_rows:
+        bucket = buckets.get(row['_id']['month'])
+        if bucket:
+            bucket['revenue'] += row['revenue']
+            bucket['booking_count'] += row['booking_count']
+    monthly_revenue = [buckets[key] for key in month_keys]
+    
+    grouped_revenue = None
+    if group_by:
+        row_fields = await fetch_by_ids(db.fields, (row['_id'].get('field_id') for row in monthly_rows), ["name", "city"])
+        groups: Dict[tuple, Dict] = {}
+        for row in monthly_rows:
+            field_id = row['_id'].get('field_id')
+            field = row_fields.get(field_id, {})
+            if group_by == "field":
+                group_key, group_name = field_id, field.get('name')
+            else:
+                group_key = group_name = field.get('city')
+            entry = groups.setdefault((row['_id']['month'], group_key), {
+                "month": row['_id']['month'],
+                "key": group_key,
+                "name": group_name,
+                "revenue": 0,
+                "booking_count": 0
+            })
+            entry['revenue'] += row['revenue']
+            entry['booking_count'] += row['booking_count']
+        grouped_revenue = {
+            "group_by": group_by,
+            "rows": sorted(groups.values(), key=lambda e: (e['month'], -e['revenue']))
+        }
     
     # Top fields by bookings
     pipeline = [
-        {"$match": {"status": {"$in": ["paid", "confirmed"]}}},
-        {"$group": {"_id": "$field_id", "count": {"$sum": 1}}},
+        {"$match": {"status": {"$in": REVENUE_STATUSES}}},
+        {"$group": {"_id": "$field_id", "count": {"$sum": "$count"}}},
+        {"$match": {"count": {"$gt": 0}}},
         {"$sort": {"count": -1}},
         {"$limit": 10}
     ]
     
-    top_fields_data = await db.bookings.aggregate(pipeline).to_list(10)
+    top_fields_data = await db.booking_rollups.aggregate(pipeline).to_list(10)
+    fields = await fetch_by_ids(db.fields, (item['_id'] for item in top_fields_data), ["name", "city"])
     top_fields = []
     for item in top_fields_data:
-        field = await db.fields.find_one({"id": item['_id']}, {"_id": 0})
+        field = fields.get(item['_id'])
         if field:
             top_fields.append({
                 "field_name": field['name'],
@@ -1826,20 +4095,62 @@ async def admin_analytics(admin: Dict = Depends(get_admin_user)):
             "cancelled": cancelled_bookings
         },
         "monthly_revenue": monthly_revenue,
+        "grouped_revenue": grouped_revenue,
         "top_fields": top_fields
     }
 
+@api_router.post("/admin/photos/gc")
+async def admin_collect_photo_garbage(admin: Dict = Depends(get_admin_user)):
+    """Delete photo files no field references"""
+    result = await collect_photo_garbage()
+    
+    await create_audit_log(
+        admin['id'],
+        admin['email'],
+        "photo_gc",
+        "photo_blobs",
+        "all",
+        result
+    )
+    
+    return {"status": "success", **result}
+
 @api_router.get("/admin/audit-logs")
 async def admin_get_audit_logs(admin: Dict = Depends(get_admin_user), limit: int = 100):
     """Get audit logs"""
+    # Read-your-writes: push buffered entries out before querying
+    await audit_log_buffer.flush()
     logs = await db.audit_logs.find({}, {"_id": 0}).sort("created_at", -1).limit(limit).to_list(limit)
     return {"logs": logs}
 
+@api_router.get("/admin/metrics")
+async def admin_get_metrics(admin: Dict = Depends(get_admin_user)):
+    """Get in-process performance metrics"""
+    return {
+        "user_cache": user_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "photo_uploads": upload_metrics.stats(),
+        "image_workers": image_workers.stats(),
+        "photo_storage": photo_storage.kind,
+        "job_queue": job_queue.stats(),
+        "audit_logs": audit_log_buffer.stats(),
+        "notification_streams": notification_hub.stats()
+    }
+
+@api_router.get("/admin/indexes")
+async def admin_get_indexes(admin: Dict = Depends(get_admin_user)):
+    """Get index bootstrap status with missing and unused indexes"""
+    return await index_manager.report()
+
 @api_router.get("/admin/support-tickets")
-async def admin_get_support_tickets(admin: Dict = Depends(get_admin_user)):
+async def admin_get_support_tickets(
+    admin: Dict = Depends(get_admin_user),
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None
+):
     """Get all support tickets"""
-    tickets = await db.support_tickets.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    return {"tickets": tickets}
+    page = await paginate(db.support_tickets, {}, {"_id": 0}, cursor, limit, legacy_limit=1000)
+    return {"tickets": page['items'], "next_cursor": page['next_cursor']}
 
 # ==================== SUPPORT SYSTEM ROUTES ====================
 
@@ -2042,6 +4353,52 @@ async def update_ticket_status(
 
 # ==================== STARTUP EVENT ====================
 
+background_startup_tasks = set()
+
+@app.on_event("startup")
+async def backfill_booking_rollups():
+    """Backfill rollups before any request or job can record one"""
+    try:
+        await ensure_booking_rollups()
+    except PyMongoError as e:
+        logger.error(f"Booking rollup backfill failed: {e}")
+
+@app.on_event("startup")
+async def start_background_workers():
+    """Start the background job queue workers and audit log flusher"""
+    job_queue.start()
+    audit_log_buffer.start()
+
+@app.on_event("startup")
+async def bootstrap_indexes():
+    """Build required indexes in the background without delaying startup"""
+    async def run():
+        try:
+            await backfill_booking_slot_locks()
+        except PyMongoError as e:
+            logger.error(f"Slot lock backfill failed: {e}")
+        try:
+            await dedupe_legacy_transactions()
+        except PyMongoError as e:
+            logger.error(f"Transaction dedupe failed: {e}")
+        try:
+            await backfill_field_geo_points()
+        except PyMongoError as e:
+            logger.error(f"Field geo backfill failed: {e}")
+        await index_manager.ensure_indexes()
+        try:
+            await reconcile_confirmed_payments()
+        except PyMongoError as e:
+            logger.error(f"Payment reconcile failed: {e}")
+        try:
+            await backfill_team_search_feed()
+        except PyMongoError as e:
+            logger.error(f"Team search feed backfill failed: {e}")
+    
+    task = asyncio.create_task(run())
+    background_startup_tasks.add(task)
+    task.add_done_callback(background_startup_tasks.discard)
+
 @app.on_event("startup")
 async def create_default_admin():
     """Create default admin account if it doesn't exist"""
@@ -2056,7 +4413,7 @@ async def create_default_admin():
         # Create admin account
         admin_user = User(
             email=admin_email,
-            password=hash_password(admin_password),
+            password=await password_hasher.hash(admin_password),
             name="E-Saha Admin",
             role="admin"
         )
@@ -2078,7 +4435,7 @@ async def create_default_admin():
         )
         log_dict = log.model_dump()
         log_dict['created_at'] = log_dict['created_at'].isoformat()
-        await db.audit_logs.insert_one(log_dict)
+        await audit_log_buffer.add(log_dict)
     
     # Backfill: Create owner profiles for existing owners without profiles
     owners_without_profiles = []
@@ -2132,4 +4489,25 @@ app.add_middleware(
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in list(background_startup_tasks):
+        task.cancel()
+    await job_queue.stop()
+    await audit_log_buffer.stop()
+    password_hasher.shutdown()
+    image_workers.shutdown()
     client.close()
+
+if __name__ == "__main__":
+    import sys
+    
+    # Maintenance commands, e.g. `python server.py rebuild-rollups`
+    if sys.argv[1:] == ["rebuild-rollups"]:
+        async def rebuild():
+            await rebuild_booking_rollups()
+            await mark_booking_rollups_backfilled()
+        asyncio.run(rebuild())
+    elif sys.argv[1:] == ["gc-photos"]:
+        asyncio.run(collect_photo_garbage())
+    else:
+        print("Usage: python server.py rebuild-rollups|gc-photos")
+        sys.exit(1)
@@ -64,6 +64,7 @@ function OwnerPanel() {
       const token = localStorage.getItem('session_token');
       const [fieldsRes, bookingsRes] = await Promise.all([
         axios.get(`${API}/fields`, {
+          params: { owner_id: user.id },
           headers: { Authorization: `Bearer ${token}` }
         }),
         axios.get(`${API}/bookings`, {
@@ -200,6 +200,10 @@ function SahaDetayPage() {
     ? field.photos 
     : ['https://via.placeholder.com/800x600?text=Saha+Fotoğrafı+Yok'];
 
+  // Prefer the resized WebP derivative when the backend has generated one
+  const photoVariant = (url, size) =>
+    field?.photo_derivatives?.find(d => d.photo_url === url)?.[size] || url;
+
   const nextPhoto = () => {
     setCurrentPhotoIndex((prev) => (prev + 1) % photos.length);
   };
@@ -237,7 +241,7 @@ function SahaDetayPage() {
             <div className="photo-gallery">
               <div className="gallery-main">
                 <img 
-                  src={`${BACKEND_URL}${photos[currentPhotoIndex]}`} 
+                  src={`${BACKEND_URL}${photoVariant(photos[currentPhotoIndex], 'full')}`} 
                   alt={`${field.name} - ${currentPhotoIndex + 1}`}
                   className="gallery-image"
                   onClick={() => setShowFullscreen(true)}
@@ -14,6 +14,7 @@ function SahalarPage() {
   const [fields, setFields] = useState([]);
   const [loading, setLoading] = useState(true);
   const [filters, setFilters] = useState({
+    q: '',
     city: '',
     date: '',
     time: ''
@@ -26,9 +27,13 @@ function SahalarPage() {
   const fetchFields = async () => {
     try {
       const params = new URLSearchParams();
+      if (filters.q.trim()) params.append('q', filters.q.trim());
       if (filters.city) params.append('city', filters.city);
-      if (filters.date) params.append('date', filters.date);
-      if (filters.time) params.append('time', filters.time);
+      if (filters.date) {
+        params.append('date', filters.date);
+        // The hour filter only means something for a given day
+        if (filters.time) params.append('time', filters.time);
+      }
 
       const response = await axios.get(`${API}/fields?${params}`);
       setFields(response.data.fields);
@@ -40,7 +45,12 @@ function SahalarPage() {
   };
 
   const handleFilterChange = (e) => {
-    setFilters({ ...filters, [e.target.name]: e.target.value });
+    const { name, value } = e.target;
+    setFilters({
+      ...filters,
+      [name]: value,
+      ...(name === 'date' && !value && { time: '' })
+    });
   };
 
   const applyFilters = () => {
@@ -48,6 +58,33 @@ function SahalarPage() {
     fetchFields();
   };
 
+  const findNearby = () => {
+    if (!navigator.geolocation) {
+      toast.error('Tarayıcınız konum desteklemiyor');
+      return;
+    }
+    setLoading(true);
+    navigator.geolocation.getCurrentPosition(async (position) => {
+      try {
+        const response = await axios.get(`${API}/fields/nearby`, {
+          params: {
+            lat: position.coords.latitude,
+            lng: position.coords.longitude,
+            ...(filters.city && { city: filters.city })
+          }
+        });
+        setFields(response.data.fields);
+      } catch (error) {
+        toast.error('Çekme başarısız');
+      } finally {
+        setLoading(false);
+      }
+    }, () => {
+      toast.error('Konum alınamadı');
+      setLoading(false);
+    });
+  };
+
   return (
     <div className="sahalar-page">
       <nav className="navbar">
@@ -74,6 +111,20 @@ function SahalarPage() {
         <div className="filters-section" data-testid="filters-section">
           <h2>Saha Ara</h2>
           <div className="filters-grid">
+            <div className="form-group">
+              <label className="form-label">Ara</label>
+              <input
+                type="search"
+                name="q"
+                className="form-input"
+                placeholder="Saha adı, semt..."
+                value={filters.q}
+                onChange={handleFilterChange}
+                onKeyDown={(e) => e.key === 'Enter' && applyFilters()}
+                data-testid="search-filter"
+              />
+            </div>
+
             <div className="form-group">
               <label className="form-label">Şehir</label>
               <select
@@ -111,9 +162,10 @@ function SahalarPage() {
                 className="form-select"
                 value={filters.time}
                 onChange={handleFilterChange}
+                disabled={!filters.date}
                 data-testid="time-filter"
               >
-                <option value="">Tüm Saatler</option>
+                <option value="">{filters.date ? 'Tüm Saatler' : 'Önce tarih seçin'}</option>
                 {Array.from({ length: 15 }, (_, i) => 9 + i).map(hour => (
                   <option key={hour} value={`${hour.toString().padStart(2, '0')}:00`}>
                     {hour.toString().padStart(2, '0')}:00
@@ -129,6 +181,14 @@ function SahalarPage() {
             >
               Filtrele
             </button>
+
+            <button
+              className="btn btn-ghost"
+              onClick={findNearby}
+              data-testid="nearby-fields-btn"
+            >
+              Yakınımdakiler
+            </button>
           </div>
         </div>
 
@@ -151,14 +211,21 @@ function SahalarPage() {
               >
                 <div className="field-image">
                   {field.photos && field.photos.length > 0 ? (
-                    <img src={field.photos[0]} alt={field.name} />
+                    <img
+                      src={field.photo_derivatives?.find(d => d.photo_url === field.photos[0])?.card || field.photos[0]}
+                      alt={field.name}
+                      loading="lazy"
+                    />
                   ) : (
                     <div className="field-placeholder">🏟️</div>
                   )}
                 </div>
                 <div className="field-content">
                   <h3>{field.name}</h3>
-                  <p className="field-location">📍 {field.city} - {field.address}</p>
+                  <p className="field-location">
+                    📍 {field.city} - {field.address}
+                    {field.distance_km !== undefined && ` · ${field.distance_km} km`}
+                  </p>
                   <div className="field-meta">
                     <span className="field-price">{field.price} TL/saat</span>
                     <span className="field-rating">
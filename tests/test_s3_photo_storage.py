@@ -0,0 +1,178 @@
+"""
+S3PhotoStorage tests against a moto stand-in for S3.
+
+Covers the direct-to-storage flow: save/dedupe, head, checksum-signed
+presigned PUT, confirm and delete. MongoDB is replaced by a tiny in-memory
+fake that only understands the queries the confirm route issues.
+"""
+
+import asyncio
+import hashlib
+import os
+import sys
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "esaha_test")
+os.environ.update(AWS_ACCESS_KEY_ID="testing", AWS_SECRET_ACCESS_KEY="testing", AWS_DEFAULT_REGION="us-east-1")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+boto3 = pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+import requests  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+import server  # noqa: E402
+
+BUCKET = "esaha-photos"
+BODY = b"\xff\xd8\xff\xe0 not really a jpeg"
+SHA256 = hashlib.sha256(BODY).hexdigest()
+KEY = f"{SHA256}.jpg"
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def write_tmp(data: bytes = BODY) -> Path:
+    tmp = server.UPLOADS_DIR / f".test-{os.getpid()}.part"
+    tmp.write_bytes(data)
+    return tmp
+
+
+@pytest.fixture
+def storage():
+    with moto.mock_aws():
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket=BUCKET)
+        yield server.S3PhotoStorage(BUCKET, "photos/", None, "us-east-1", None, 900)
+
+
+class FakeCollection:
+    """Just enough of a Motor collection for the photo confirm path"""
+
+    def __init__(self, docs=None):
+        self.docs = docs or []
+
+    @staticmethod
+    def _matches(doc, query):
+        for field, cond in query.items():
+            if field == "photos.9":
+                has_ten = len(doc.get("photos", [])) > 9
+                if has_ten != cond["$exists"]:
+                    return False
+            elif isinstance(cond, dict) and "$ne" in cond:
+                value = doc.get(field)
+                if value == cond["$ne"] or (isinstance(value, list) and cond["$ne"] in value):
+                    return False
+            elif doc.get(field) != cond:
+                return False
+        return True
+
+    async def find_one(self, query, projection=None):
+        return next((dict(d) for d in self.docs if self._matches(d, query)), None)
+
+    async def update_one(self, query, update, upsert=False):
+        doc = next((d for d in self.docs if self._matches(d, query)), None)
+        if doc is None and upsert:
+            doc = {**query, **update.get("$setOnInsert", {})}
+            self.docs.append(doc)
+        if doc is not None:
+            for field, value in update.get("$push", {}).items():
+                doc.setdefault(field, []).append(value)
+            for field, value in update.get("$inc", {}).items():
+                doc[field] = doc.get(field, 0) + value
+            for field, value in update.get("$set", {}).items():
+                doc[field] = value
+
+        class Result:
+            matched_count = int(doc is not None)
+        return Result()
+
+
+class FakeDB:
+    def __init__(self, fields):
+        self.fields = FakeCollection(fields)
+        self.photo_blobs = FakeCollection()
+
+
+def test_save_dedupes_and_removes_temp_file(storage):
+    tmp = write_tmp()
+    assert run(storage.save(tmp, KEY)) is True
+    assert not tmp.exists()
+
+    # Same content-addressed key again: no second upload, temp still cleaned up
+    tmp = write_tmp()
+    assert run(storage.save(tmp, KEY)) is False
+    assert not tmp.exists()
+    assert [key for key, _ in run(storage.list_entries())] == [KEY]
+
+
+def test_head_reports_size_and_missing_keys(storage):
+    run(storage.save(write_tmp(), KEY))
+    head = run(storage.head(KEY))
+    assert head["size"] == len(BODY)
+    assert run(storage.head("0" * 64 + ".jpg")) is None
+
+
+def test_presigned_put_signs_checksum_and_uploads(storage):
+    upload = run(storage.presign_upload(KEY, "image/jpeg", len(BODY), SHA256))
+
+    signed = parse_qs(urlparse(upload["url"]).query)
+    assert signed["X-Amz-Algorithm"] == ["AWS4-HMAC-SHA256"]
+    signed_headers = signed["X-Amz-SignedHeaders"][0].split(";")
+    assert "x-amz-checksum-sha256" in signed_headers
+    assert "content-type" in signed_headers
+
+    response = requests.put(upload["url"], data=BODY, headers=upload["headers"])
+    assert response.status_code == 200
+    assert run(storage.head(KEY))["size"] == len(BODY)
+
+
+def test_confirm_attaches_uploaded_photo(storage, monkeypatch):
+    owner = {"id": "owner-1", "email": "o@example.com", "role": "owner"}
+    fake_db = FakeDB([{"id": "field-1", "owner_id": owner["id"], "photos": [], "cover_photo_url": None}])
+    monkeypatch.setattr(server, "db", fake_db)
+    monkeypatch.setattr(server, "photo_storage", storage)
+
+    async def no_derivatives(field_id, photo_url):
+        return None
+    monkeypatch.setattr(server.image_workers, "build_derivatives", no_derivatives)
+
+    app = FastAPI()
+    app.include_router(server.api_router)
+    app.dependency_overrides[server.get_current_user] = lambda: owner
+    client = TestClient(app)
+
+    # Nothing in the bucket yet: confirm must refuse
+    response = client.post("/api/fields/field-1/photos/confirm", json={"key": KEY})
+    assert response.status_code == 404
+
+    run(storage.save(write_tmp(), KEY))
+    response = client.post("/api/fields/field-1/photos/confirm", json={"key": KEY})
+    assert response.status_code == 200
+    photo_url = f"/api/uploads/photos/{KEY}"
+    field = fake_db.fields.docs[0]
+    assert field["photos"] == [photo_url]
+    assert field["cover_photo_url"] == photo_url
+    assert fake_db.photo_blobs.docs[0]["refs"] == 1
+
+    # Presign for bytes the field already has short-circuits without an upload
+    response = client.post(
+        "/api/fields/field-1/photos/presign",
+        json={"content_type": "image/jpeg", "size": len(BODY), "sha256": SHA256}
+    )
+    assert response.status_code == 200
+    assert response.json()["upload"] is None
+
+
+def test_delete_removes_objects(storage):
+    run(storage.save(write_tmp(), KEY))
+    run(storage.delete([KEY]))
+    assert run(storage.exists(KEY)) is False
+    # Deleting nothing is a no-op
+    run(storage.delete([]))